@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from datetime import datetime
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from instrumentation import query_budget
+from models import db, Artist, Show, Venue
+from recurrence import insert_shows, expand_rule, show_pages
+from scheduling import overlap_message
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# exported columns of each table, in output order
+EXPORTS = {
+    'venues': (Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+                       'image_link', 'facebook_link', 'website', 'seeking_talent',
+                       'seeking_description', 'updated_at']),
+    'artists': (Artist, ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                         'facebook_link', 'website', 'seeking_venue', 'seeking_description',
+                         'created_on', 'updated_at']),
+    'shows': (Show, ['id', 'venue_id', 'artist_id', 'start_time', 'end_time', 'updated_at']),
+}
+
+
+# media type of each export format
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(value)
+    return _json_value(value)
+
+
+def export_statement(kind, args):
+    # (statement, columns, format) of an export request; raises KeyError
+    # for an unknown table and ValueError for bad ?format= or ?since=
+    model, columns = EXPORTS[kind]
+
+    output = args.get('format', 'ndjson')
+    if output not in FORMATS:
+        raise ValueError('format must be ndjson or csv')
+
+    stmt = select(*[getattr(model, column) for column in columns]).order_by(model.id)
+
+    since = args.get('since')
+    if since:
+        try:
+            stmt = stmt.where(model.updated_at >= datetime.fromisoformat(since))
+        except ValueError:
+            raise ValueError('since must be an ISO 8601 date or time')
+
+    return stmt, columns, output
+
+
+def export_header(columns, output):
+    return ','.join(columns) + '\r\n' if output == 'csv' else ''
+
+
+def export_rows(rows, columns, output):
+    # one streamed chunk of rows in the export format
+    if output == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue()
+    return ''.join(json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + '\n'
+                   for row in rows)
+
+
+def export_headers(kind, output):
+    return {'Content-Disposition': f'attachment; filename={kind}.{output}'}
+
+
+@api.route('/<kind>/export')
+@query_budget(1)
+def export(kind):
+    # Streams a whole table as NDJSON (default) or CSV (?format=csv).
+    # ?since=<ISO 8601 UTC time> limits it to rows changed since then for
+    # incremental pulls. Rows are read through a server-side cursor in
+    # EXPORT_CHUNK_SIZE batches, so memory use does not grow with the table.
+    try:
+        stmt, columns, output = export_statement(kind, request.args)
+    except KeyError:
+        abort(404)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    result = db.session.execute(stmt.execution_options(stream_results=True, max_row_buffer=chunk_size))
+
+    def chunks():
+        yield export_header(columns, output)
+        for rows in result.partitions(chunk_size):
+            yield export_rows(rows, columns, output)
+
+    return Response(stream_with_context(chunks()), mimetype=FORMATS[output],
+                    headers=export_headers(kind, output))
+
+
+@api.route('/shows', methods=['POST'])
+def create_show_batch():
+    # Creates an artist's shows in one transaction from either a rule
+    #   {"artist_id", "venue_id", "start_time", "frequency", "count"}
+    # or explicit pairs
+    #   {"artist_id", "shows": [{"venue_id", "start_time"}, ...]}
+    # and answers 201 with the new show ids, or 409 if one would overlap
+    # another show of the venue or artist.
+    body = request.get_json(silent=True) or {}
+    try:
+        artist_id = int(body['artist_id'])
+        if 'shows' in body:
+            occurrences = [(int(show['venue_id']), datetime.fromisoformat(show['start_time']))
+                           for show in body['shows']]
+        else:
+            occurrences = expand_rule(int(body['venue_id']),
+                                      datetime.fromisoformat(body['start_time']),
+                                      body.get('frequency', 'weekly'), int(body['count']),
+                                      current_app.config['MAX_RECURRING_SHOWS'])
+        show_ids = insert_shows(artist_id, occurrences, current_app.config['MAX_RECURRING_SHOWS'])
+        db.session.commit()
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        message = f'{e} is required' if isinstance(e, KeyError) else str(e)
+        return jsonify({'error': message}), 400
+    except IntegrityError as e:
+        db.session.rollback()
+        if not overlap_message(e):
+            raise
+        return jsonify({'error': overlap_message(e)}), 409
+
+    current_app.extensions['page_cache'].invalidate_prefix(
+        *show_pages(artist_id, {venue_id for venue_id, _ in occurrences}))
+    return jsonify({'ids': show_ids}), 201
@@ -3,19 +3,41 @@
 #----------------------------------------------------------------------------#
 
 
+import click
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from datetime import datetime, timedelta
+from itertools import chain, groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, make_response
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import raiseload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
 from flask_wtf import Form
-from forms import ArtistForm, VenueForm, ShowForm
+from forms import ArtistForm, VenueForm, ShowForm, RecurringShowForm
 from flask_migrate import Migrate
-from models import db, Artist, Venue, Show
-import sys
+from models import db, Artist, Venue, Show, guard_lazy_loads, show_end_time
+from api import api
+from importer import ImportAborted, import_rows, read_rows
+from recurrence import insert_shows, expand_rule, parse_occurrences, show_pages
+from periodic import start_periodic_task
+from pagination import keyset_result, keyset_statement
+import queries
+from facets import genre_facets, rebuild_genre_facets, update_genre_facets
+from scheduling import free_slots, overlap_message
+from search import TRIGRAM_CHECK, search
+from showcounts import rebuild_show_counts, record_new_shows, refresh_show_counts, start_show_count_roller
+from typeahead import PrefixIndex
+from cache import LRUCache
+from pool import InstrumentedQueuePool
+from instrumentation import init_instrumentation, query_budget
+from metrics import exposition, init_metrics
+from logs import init_logging
+from fragments import FragmentCacheExtension
+from filters import format_datetime, format_show_times
+from conditional import artist_validators, venue_validators, has_pending_flash, not_modified, page_cache_key, set_validators
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -24,157 +46,308 @@ import sys
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault('poolclass', InstrumentedQueuePool)
 db.init_app(app)
 # db = SQLAlchemy(app)
 
+guard_lazy_loads(db.session)
+init_instrumentation(app)
+init_metrics(app)
+init_logging(app)
+
 # TODO: connect to a local postgresql database
 migrate = Migrate(app, db)
 
+app.register_blueprint(api)
+
+typeahead_index = PrefixIndex(max_entries=app.config['TYPEAHEAD_MAX_ENTRIES'])
+
+# template data of the listing and detail pages, keyed by request.full_path
+page_cache = LRUCache(max_entries=app.config['PAGE_CACHE_MAX_ENTRIES'],
+                      ttl=app.config['PAGE_CACHE_TTL'])
+app.extensions['page_cache'] = page_cache  # for blueprints
+
+
+def typeahead_version():
+    # changes whenever a venue or artist is created, edited or deleted, by
+    # any worker; one statement over the updated_at indexes
+    return tuple(db.session.execute(select(*(
+        select(aggregate).scalar_subquery() for aggregate in (
+            func.count(Venue.id), func.max(Venue.updated_at),
+            func.count(Artist.id), func.max(Artist.updated_at))))).one())
+
+
+def refresh_typeahead_index():
+    # (re)builds the index unless it already holds the current data
+    version = typeahead_version()
+    if typeahead_index.loaded and typeahead_index.version == version:
+        return
+    venues = db.session.query(Venue.id, Venue.name).yield_per(10000)
+    artists = db.session.query(Artist.id, Artist.name).yield_per(10000)
+    typeahead_index.load(chain(
+        (('venue', venue.id, venue.name) for venue in venues),
+        (('artist', artist.id, artist.name) for artist in artists)), version)
+
+
+@app.before_first_request
+def load_typeahead_index():
+    # every worker builds its own index; the write handlers keep it current
+    # and a periodic check reloads it after changes made by other workers
+    refresh_typeahead_index()
+    start_periodic_task(app, 'typeahead_refresher',
+                        app.config['TYPEAHEAD_REFRESH_INTERVAL'], refresh_typeahead_index)
+
+
+@app.before_first_request
+def check_search_ranking():
+    # search ranks by similarity() only where pg_trgm is installed
+    app.extensions['pg_trgm'] = db.session.execute(TRIGRAM_CHECK).scalar()
+
+
+@app.before_first_request
+def start_rolling_show_counts():
+    # moves shows from upcoming to past in show_counts as they start
+    start_show_count_roller(app)
+
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
 
-# def format_datetime(value, format='medium'):
-#     date = dateutil.parser.parse(value)
-#     if format == 'full':
-#         format = "EEEE MMMM, d, y 'at' h:mma"
-#     elif format == 'medium':
-#         format = "EE MM, dd, y h:mma"
-#     return babel.dates.format_datetime(date, format, locale='en')
-def format_datetime(value, format='medium'):
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-        if format == 'full':
-            format = "EEEE MMMM, d, y 'at' h:mma"
-        elif format == 'medium':
-            format = "EE MM, dd, y h:mma"
-        return babel.dates.format_datetime(date, format, locale='en')
-    else:
-        date = value
-
-
 app.jinja_env.filters['datetime'] = format_datetime
 
+# {% cache %} blocks for per-entity tiles, see fragments.py
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = LRUCache(
+    max_entries=app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+    ttl=app.config['FRAGMENT_CACHE_TTL'])
+
 #----------------------------------------------------------------------------#
-# Controllers.
+# Helpers.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
+def expect_version(entity, version):
+    # Makes the next UPDATE of entity apply only if its row is still at the
+    # version the edit form was rendered from. Venue, Artist and Show map
+    # version as version_id_col, so an edit made by someone else in between
+    # fails with StaleDataError instead of being overwritten.
+    if version is not None:
+        set_committed_value(entity, 'version', version)
 
 
-#  Venues
-#  ----------------------------------------------------------------
+def split_shows(shows):
+    # partitions show rows carrying an `upcoming` flag computed in SQL
+    # into (past_shows, upcoming_shows) lists of template-ready dicts
+    past_shows = []
+    upcoming_shows = []
+
+    for show in shows:
+        data = show._asdict()
+        upcoming = data.pop('upcoming')
+        if upcoming:
+            upcoming_shows.append(data)
+        else:
+            past_shows.append(data)
+
+    format_show_times(past_shows + upcoming_shows)
+    return past_shows, upcoming_shows
 
-@app.route('/venues')
-def venues():
-    data = []
 
-    regions = Venue.query.with_entities(
-        Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
+def venue_pages(venue_id):
+    # cache keys of every page that renders this venue's details
+    artist_ids = db.session.query(Show.artist_id).filter(
+        Show.venue_id == venue_id).distinct()
+    return ['/venues?', '/shows?', f'/venues/{venue_id}?'] + [
+        f'/artists/{artist_id}?' for artist_id, in artist_ids]
 
-    # Looping over each location
-    for region in regions:
-        city = region.city
-        state = region.state
 
-        venues = Venue.query.filter_by(state=state, city=city).all()
+def artist_pages(artist_id):
+    # cache keys of every page that renders this artist's details
+    venue_ids = db.session.query(Show.venue_id).filter(
+        Show.artist_id == artist_id).distinct()
+    return ['/artists?', '/shows?', f'/artists/{artist_id}?'] + [
+        f'/venues/{venue_id}?' for venue_id, in venue_ids]
+
+
+def catalogue_filters(args):
+    # ?genre= (repeatable), ?city= and ?state= of the /venues and /artists pages
+    return {
+        'genres': args.getlist('genre'),
+        'city': args.get('city'),
+        'state': args.get('state')
+    }
+
+
+def venue_areas(rows):
+    # venue directory rows grouped into [{city, state, venues}]; rows are
+    # ordered by region, so each city/state is one contiguous run
+    data = []
 
+    for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
         venues_data = []
 
         for venue in venues:
             venues_data.append({
                 'id': venue.id,
                 'name': venue.name,
+                'version': venue.version,
                 'num_upcoming_shows': venue.num_upcoming_shows
             })
 
         data.append({"city": city, "state": state, "venues": venues_data
                      })
-    return render_template('pages/venues.html', areas=data)
-    # TODO: replace with real venues data.
+    return data
 
 
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    search_term = request.form.get('search_term', '')
+def venue_page(venue, shows):
+    # template data of /venues/<id> from the venue row and its show rows
+    past_shows, upcoming_shows = split_shows(shows)
+
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": True if venue.seeking_talent in (True, 't', 'True', 'y') else False,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link if venue.image_link else "",
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows
+    }
 
-    venues = Venue.query.filter(Venue.name.ilike('%' + search_term + '%'))
 
-    data = []
-    for venue in venues:
-        data.append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": venue.num_upcoming_shows
-        })
-
-    counts = len(data)
-    response = {
-        "count": counts,
-        "data": data
+def artist_page(artist, shows):
+    # template data of /artists/<id> from the artist row and its show rows
+    past_shows, upcoming_shows = split_shows(shows)
+
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "seeking_venue": True if artist.seeking_venue in ('y', True, 't', 'True') else False,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "facebook_link": artist.facebook_link,
+        "website": artist.website,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+
     }
 
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+
+@app.route('/')
+@query_budget(0)
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@app.route('/venues')
+@query_budget(2)
+def venues():
+    filters = catalogue_filters(request.args)
+
+    def build():
+        rows = db.session.execute(queries.venue_directory(filters)).all()
+        return {'areas': venue_areas(rows), 'filters': filters, 'facets': genre_facets('venue')}
+
+    return render_template('pages/venues.html', **page_cache.get_or_set(request.full_path, build))
+
+
+@app.route('/venues/search', methods=['GET', 'POST'])
+@query_budget(2)
+def search_venues():
+    # the navbar form posts the term; result pages link back with GET
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+
+    results = search(Venue, search_term, max(page, 1),
+                     app.config['SEARCH_RESULTS_PER_PAGE'])
+
+    return render_template('pages/search_venues.html', results=results, search_term=search_term)
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
 
 
 @app.route('/venues/<int:venue_id>')
+@query_budget(3)
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    venue = Venue.query.get(venue_id)
+    def build():
+        venue = db.session.execute(queries.venue(venue_id)).first()
+        if not venue:
+            return None
+        return venue_page(venue, db.session.execute(queries.venue_shows(venue_id)).all())
 
-    if not venue:
+    validators = venue_validators(venue_id)
+
+    if not validators:
         flash("Venue with ID " + str(venue_id) +
               " was not found!", 'danger')
         return redirect(url_for('venues'))
 
-    past_shows = []
-    for show in venue.past_shows():
-        artist = Artist.query.get(show.artist_id)
-        past_shows.append({
-            "artist_id": show.artist_id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(show.start_time)
-        })
+    conditional = not has_pending_flash()
+    if conditional:
+        response = not_modified(*validators)
+        if response:
+            return response
+
+    data = page_cache.get_or_set(page_cache_key(request.full_path, validators[0]), build)
+    response = make_response(render_template('pages/show_venue.html', venue=data))
+    if conditional:
+        set_validators(response, *validators)
+    return response
 
-    upcoming_shows = []
-    for show in venue.upcoming_shows():
-        artist = Artist.query.get(show.artist_id)
-        upcoming_shows.append({
-            "artist_id": show.artist_id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "start_time": str(show.start_time)
-        })
-
-    data = {
-        "id": venue.id,
-        "name": venue.name,
-        "genres": venue.genres,
-        "address": venue.address,
-        "city": venue.city,
-        "state": venue.state,
-        "phone": venue.phone,
-        "website": venue.website,
-        "facebook_link": venue.facebook_link,
-        "seeking_talent": True if venue.seeking_talent in (True, 't', 'True', 'y') else False,
-        "seeking_description": venue.seeking_description,
-        "image_link": venue.image_link if venue.image_link else "",
-        "past_shows_count": venue.num_past_shows(),
-        "upcoming_shows_count": venue.num_upcoming_shows(),
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows
-    }
 
-    return render_template('pages/show_venue.html', venue=data)
+@app.route('/venues/<int:venue_id>/availability')
+@query_budget(1)
+def venue_availability(venue_id):
+    # free time at the venue from ?start= through ?end= (YYYY-MM-DD, both
+    # inclusive), optionally only gaps of at least ?minutes=
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d')
+        end = datetime.strptime(request.args.get('end', request.args['start']),
+                                '%Y-%m-%d') + timedelta(days=1)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start (and end) must be YYYY-MM-DD'}), 400
+    days = (end - start).days
+    if days < 1 or days > app.config['AVAILABILITY_MAX_DAYS']:
+        return jsonify({'error': 'end must be on or after start and at most '
+                        f'{app.config["AVAILABILITY_MAX_DAYS"]} days later'}), 400
+    min_length = timedelta(minutes=max(0, request.args.get('minutes', 0, type=int)))
+
+    shows = db.session.execute(queries.venue_schedule(venue_id, start, end)).all()
+    if not shows:
+        return jsonify({'error': f'Venue ID {venue_id} does not exist'}), 404
+    return jsonify({
+        'venue_id': venue_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'free': [{'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+                 for slot_start, slot_end in free_slots(shows, start, end, min_length)]
+    })
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -208,12 +381,15 @@ def create_venue_submission():
                       genres=genres, website=website, seeking_talent=seeking_talent, seeking_description=seeking_description)
 
         db.session.add(venue)
+        update_genre_facets('venue', None, genres)
         db.session.commit()
+        typeahead_index.add('venue', venue.id, name)
+        page_cache.invalidate_prefix('/venues?')
         status = True
     except Exception:
         db.session.rollback()
         status = False
-        print(sys.exc_info())
+        app.logger.exception('failed creating venue')
     finally:
         db.session.close()
 
@@ -236,16 +412,26 @@ def delete_venue(venue_id):
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
     status = False
     try:
-        # remove the associated shows
-        Show.query.filter_by(venue_id=venue_id).delete()
-
-        Venue.query.filter_by(id=venue_id).delete()
+        stale_pages = venue_pages(venue_id)
+
+        # remove the associated shows and recount their artists
+        artist_ids = db.session.execute(Show.__table__.delete().where(
+            Show.venue_id == venue_id).returning(Show.artist_id)).scalars().all()
+        refresh_show_counts('artist', artist_ids)
+        refresh_show_counts('venue', [int(venue_id)])
+
+        deleted = db.session.execute(Venue.__table__.delete().where(
+            Venue.id == venue_id).returning(Venue.genres)).first()
+        if deleted:
+            update_genre_facets('venue', deleted.genres, None)
         db.session.commit()
+        typeahead_index.remove('venue', int(venue_id))
+        page_cache.invalidate_prefix(*stale_pages)
         status = True
     except:
         db.session.rollback()
         status = False
-        print(sys.exc_info())
+        app.logger.exception('failed deleting venue')
     finally:
         db.session.close()
 
@@ -259,84 +445,99 @@ def delete_venue(venue_id):
 
 
 @app.route('/artists')
+@query_budget(2)
 def artists():
-    # TODO: replace with real data returned from querying the database
-    data = Artist.query.with_entities(Artist.id, Artist.name).all()
-    return render_template('pages/artists.html', artists=data)
+    filters = catalogue_filters(request.args)
 
+    def build():
+        data = db.session.execute(queries.artist_directory(filters)).all()
+        return {'artists': data, 'filters': filters, 'facets': genre_facets('artist')}
 
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-    search_term = request.form.get('search_term', '')
+    return render_template('pages/artists.html', **page_cache.get_or_set(request.full_path, build))
 
-    artists = Artist.query.filter(Artist.name.ilike('%' + search_term + '%'))
 
-    data = []
-    for artist in artists:
-        data.append({
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": artist.num_upcoming_shows
-        })
-
-    counts = len(data)
-    results = {
-        "count": counts,
-        "data": data
-    }
+@app.route('/artists/search', methods=['GET', 'POST'])
+@query_budget(2)
+def search_artists():
+    # the navbar form posts the term; result pages link back with GET
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+
+    results = search(Artist, search_term, max(page, 1),
+                     app.config['SEARCH_RESULTS_PER_PAGE'])
 
     return render_template('pages/search_artists.html', results=results, search_term=search_term)
 
 
 @app.route('/artists/<int:artist_id>')
+@query_budget(3)
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
-    artist = Artist.query.filter(Artist.id == artist_id).first()
-    if not artist:
+    def build():
+        artist = db.session.execute(queries.artist(artist_id)).first()
+        if not artist:
+            return None
+        return artist_page(artist, db.session.execute(queries.artist_shows(artist_id)).all())
+
+    validators = artist_validators(artist_id)
+
+    if not validators:
         flash("Artist with ID " + str(artist_id) +
               " was not found!", 'danger')
         return redirect(url_for('artists'))
 
-    past_shows = []
-    for show in artist.past_shows():
-        venue = Venue.query.get(show.venue_id)
-        past_shows.append({
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": str(show.start_time)
-        })
+    conditional = not has_pending_flash()
+    if conditional:
+        response = not_modified(*validators)
+        if response:
+            return response
 
-    upcoming_shows = []
-    for show in artist.upcoming_shows():
-        venue = Venue.query.get(show.venue_id)
-        upcoming_shows.append({
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": str(show.start_time)
-        })
-
-    data = {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres,
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "seeking_venue": True if artist.seeking_venue in ('y', True, 't', 'True') else False,
-        "seeking_description": artist.seeking_description,
-        "image_link": artist.image_link,
-        "facebook_link": artist.facebook_link,
-        "website": artist.website,
-        "past_shows_count": artist.num_past_shows(),
-        "upcoming_shows_count": artist.num_upcoming_shows(),
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
+    data = page_cache.get_or_set(page_cache_key(request.full_path, validators[0]), build)
+    response = make_response(render_template('pages/show_artist.html', artist=data))
+    if conditional:
+        set_validators(response, *validators)
+    return response
+
+
+#  Typeahead
+#  ----------------------------------------------------------------
+
+
+@app.route('/typeahead')
+@query_budget(0)
+def typeahead():
+    # answered from the in-memory index only, never from the database
+    kinds = request.args.getlist('type') or ('venue', 'artist')
+    results = typeahead_index.lookup(request.args.get('q', ''), kinds,
+                                     limit=app.config['TYPEAHEAD_RESULTS'])
+    return jsonify({'results': results})
+
+
+#  Cache
+#  ----------------------------------------------------------------
 
-    }
 
-    return render_template('pages/show_artist.html', artist=data)
+@app.route('/metrics')
+@query_budget(0)
+def metrics():
+    body, content_type = exposition()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/pool/stats')
+def pool_stats():
+    return jsonify({
+        'primary': db.engine.pool.stats(),
+        'replicas': [engine.pool.stats() for engine in app.extensions['replicas'].engines]
+    })
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify({
+        'pages': page_cache.stats(),
+        'fragments': app.jinja_env.fragment_cache.stats()
+    })
 
 
 #  Update
@@ -345,7 +546,7 @@ def show_artist(artist_id):
 def edit_artist(artist_id):
     form = ArtistForm()
 
-    artist = Artist.query.get(artist_id)
+    artist = Artist.query.options(raiseload('*')).get(artist_id)
     form.name.data = artist.name
     form.city.data = artist.city
     form.state.data = artist.state
@@ -363,14 +564,17 @@ def edit_artist(artist_id):
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     status = False
-    artist = Artist.query.get(artist_id)
+    artist = Artist.query.options(raiseload('*')).get(artist_id)
 
     if not artist:
         flash('An error occurred. Artist with ID ' +
               str(artist_id) + ' was not found!', 'danger')
         return redirect(url_for('artists'))
 
+    stale = False
     try:
+        expect_version(artist, request.form.get('version', type=int))
+        old_genres = artist.genres
         artist.name = request.form['name']
         artist.city = request.form['city']
         artist.state = request.form['state']
@@ -382,15 +586,25 @@ def edit_artist_submission(artist_id):
         artist.seeking_venue = True if 'seeking_venue' in request.form else False
         artist.seeking_description = request.form['seeking_description']
 
+        update_genre_facets('artist', old_genres, artist.genres)
         db.session.commit()
+        typeahead_index.add('artist', artist_id, request.form['name'])
+        page_cache.invalidate_prefix(*artist_pages(artist_id))
         status = True
+    except StaleDataError:
+        db.session.rollback()
+        stale = True
     except:
         db.session.rollback()
         status = False
-        print(sys.exc_info())
+        app.logger.exception('failed editing artist')
     finally:
         db.session.close()
 
+    if stale:
+        flash('Artist ' + request.form['name'] + ' was modified by someone else while you '
+              'were editing it. Your changes were not saved; please review and edit again.', 'danger')
+        return redirect(url_for('edit_artist', artist_id=artist_id))
     if not status:
         # on unsuccessful db insert, flash an error instead.
         flash('An error occurred. Artist ' +
@@ -406,7 +620,7 @@ def edit_artist_submission(artist_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-    venue = Venue.query.filter(Venue.id == venue_id).first()
+    venue = Venue.query.options(raiseload('*')).get(venue_id)
     form = VenueForm()
 
     form.name.data = venue.name
@@ -429,14 +643,17 @@ def edit_venue(venue_id):
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     status = False
-    venue = Venue.query.get(venue_id)
+    venue = Venue.query.options(raiseload('*')).get(venue_id)
 
     if not venue:
         flash('An error occurred. Venue with ID ' +
               str(venue_id) + ' was not found!', 'danger')
         return redirect(url_for('venues'))
 
+    stale = False
     try:
+        expect_version(venue, request.form.get('version', type=int))
+        old_genres = venue.genres
         venue.name = request.form['name']
         venue.city = request.form['city']
         venue.state = request.form['state']
@@ -449,15 +666,25 @@ def edit_venue_submission(venue_id):
         venue.seeking_talent = True if 'seeking_talent' in request.form else False
         venue.seeking_description = request.form['seeking_description']
 
+        update_genre_facets('venue', old_genres, venue.genres)
         db.session.commit()
+        typeahead_index.add('venue', venue_id, request.form['name'])
+        page_cache.invalidate_prefix(*venue_pages(venue_id))
         status = True
+    except StaleDataError:
+        db.session.rollback()
+        stale = True
     except:
         db.session.rollback()
         status = False
-        print(sys.exc_info())
+        app.logger.exception('failed editing venue')
     finally:
         db.session.close()
 
+    if stale:
+        flash('Venue ' + request.form['name'] + ' was modified by someone else while you '
+              'were editing it. Your changes were not saved; please review and edit again.', 'danger')
+        return redirect(url_for('edit_venue', venue_id=venue_id))
     if not status:
         # on unsuccessful db insert, flash an error instead.
         flash('An error occurred. Venue ' +
@@ -502,12 +729,15 @@ def create_artist_submission():
             seeking_description=form.seeking_description.data)
 
         db.session.add(new_artist)
+        update_genre_facets('artist', None, new_artist.genres)
         db.session.commit()
+        typeahead_index.add('artist', new_artist.id, form.name.data)
+        page_cache.invalidate_prefix('/artists?')
         status = True
     except Exception:
         db.session.rollback()
         status = False
-        print(sys.exc_info())
+        app.logger.exception('failed creating artist')
     finally:
         db.session.close()
 
@@ -523,20 +753,38 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 @app.route('/shows')
+@query_budget(1)
 def shows():
-    data = db.session.query(Show).join(Venue, (Venue.id == Show.venue_id)).join(Artist, (Artist.id == Show.artist_id)).with_entities(Show.venue_id, Venue.name.label(
-        'venue_name'), Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'), Show.start_time).all()
+    # keyset-paginated feed: ?when=upcoming|past, ?city=, ?start_date= and
+    # ?end_date= (YYYY-MM-DD) narrow it, ?cursor= continues after a page
+    when = request.args.get('when', 'all')
+    city = request.args.get('city')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    cursor = request.args.get('cursor')
 
-    def format_data(d):
-        d = dict(zip(d.keys(), d))
-        d['start_time'] = str(d['start_time'])
-        return d
+    def build():
+        # past shows read most recent first, everything else soonest first
+        stmt = keyset_statement(
+            queries.show_feed(when, city, start_date, end_date), Show.start_time, Show.id,
+            cursor, app.config['SHOWS_PER_PAGE'], descending=(when == 'past'))
+        data, next_cursor = keyset_result(
+            db.session.execute(stmt).all(), Show.start_time, Show.id, app.config['SHOWS_PER_PAGE'])
 
-    data = [format_data(d) for d in data]
+        data = format_show_times([d._asdict() for d in data])
 
-    return render_template('pages/shows.html', shows=data)
-    # displays list of shows at /shows
-    # TODO: replace with real venues data.
+        filters = {'when': when, 'city': city,
+                   'start_date': start_date, 'end_date': end_date}
+
+        return {'shows': data, 'filters': filters, 'next_cursor': next_cursor}
+
+    try:
+        context = page_cache.get_or_set(request.full_path, build)
+    except ValueError:
+        flash('Invalid show filters or page cursor.', 'danger')
+        return redirect(url_for('shows'))
+
+    return render_template('pages/shows.html', **context)
 
 
 @app.route('/shows/create')
@@ -550,11 +798,23 @@ def create_shows():
 def create_show_submission():
     venue_id = request.form.get('venue_id')
     artist_id = request.form.get('artist_id')
-    start_time = request.form.get('start_time')
     status = False
+    message = 'Show could not be listed.'
+
+    try:
+        start_time = datetime.fromisoformat(request.form.get('start_time', '').strip())
+        end_time = request.form.get('end_time', '').strip()
+        end_time = datetime.fromisoformat(end_time) if end_time else show_end_time(start_time)
+    except ValueError:
+        flash('An error occurred. Show could not be listed. Start and end time must be YYYY-MM-DD HH:MM.', 'danger')
+        return redirect(url_for('index'))
+
+    if end_time <= start_time:
+        flash('An error occurred. Show could not be listed. End time must be after the start time.', 'danger')
+        return redirect(url_for('index'))
 
-    venue = Venue.query.get(venue_id)
-    artist = Artist.query.get(artist_id)
+    venue = Venue.query.options(raiseload('*')).get(venue_id)
+    artist = Artist.query.options(raiseload('*')).get(artist_id)
 
     if not venue:
         flash('An error occurred. Show could not be listed. Venue ID ' +
@@ -568,21 +828,32 @@ def create_show_submission():
 
     try:
         show = Show(venue_id=venue_id, artist_id=artist_id,
-                    start_time=start_time)
+                    start_time=start_time, end_time=end_time)
 
         db.session.add(show)
+        record_new_shows([(venue.id, artist.id, start_time)])
         db.session.commit()
+        page_cache.invalidate_prefix(
+            '/shows?', '/venues?', f'/venues/{venue.id}?', f'/artists/{artist.id}?')
         status = True
+    except IntegrityError as e:
+        # the exclusion constraints reject overlapping shows
+        db.session.rollback()
+        status = False
+        if overlap_message(e):
+            message = f'{message} {overlap_message(e)}'
+        else:
+            app.logger.exception('failed creating show')
     except:
         db.session.rollback()
         status = False
-        print(sys.exc_info())
+        app.logger.exception('failed creating show')
     finally:
         db.session.close()
 
         # on unsuccessful db insert, flash an error instead.
     if not status:
-        flash('An error occurred. Show could not be listed.', 'danger')
+        flash('An error occurred. ' + message, 'danger')
     else:
         # on successful db insert, flash success
         flash('Show was successfully listed!', 'success')
@@ -599,6 +870,63 @@ def create_show_submission():
     # return render_template('pages/home.html')
 
 
+@app.route('/shows/create/recurring')
+def create_recurring_shows():
+    form = RecurringShowForm()
+    return render_template('forms/new_recurring_show.html', form=form)
+
+
+@app.route('/shows/create/recurring', methods=['POST'])
+def create_recurring_shows_submission():
+    form = RecurringShowForm(request.form)
+    if not form.validate():
+        # e.g. a malformed start time or count, shown next to the form
+        return render_template('forms/new_recurring_show.html', form=form), 400
+
+    status = False
+    message = 'Shows could not be listed.'
+    try:
+        venue_id = form.venue_id.data or ''
+        if (form.occurrences.data or '').strip():
+            occurrences = parse_occurrences(form.occurrences.data)
+        elif venue_id.isdigit() and form.start_time.data and form.count.data:
+            occurrences = expand_rule(int(venue_id), form.start_time.data,
+                                      form.frequency.data, form.count.data,
+                                      app.config['MAX_RECURRING_SHOWS'])
+        else:
+            raise ValueError('Enter a venue, first start time and count, or a list of shows.')
+
+        artist_id = form.artist_id.data or ''
+        if not artist_id.isdigit():
+            raise ValueError(f'Artist ID {artist_id} is invalid!')
+        show_ids = insert_shows(int(artist_id), occurrences, app.config['MAX_RECURRING_SHOWS'])
+        db.session.commit()
+        page_cache.invalidate_prefix(
+            *show_pages(artist_id, {venue_id for venue_id, _ in occurrences}))
+        status = True
+    except ValueError as e:
+        db.session.rollback()
+        message = f'{message} {e}'
+    except IntegrityError as e:
+        db.session.rollback()
+        if overlap_message(e):
+            message = f'{message} {overlap_message(e)}'
+        else:
+            app.logger.exception('failed creating recurring shows')
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('failed creating recurring shows')
+    finally:
+        db.session.close()
+
+    if not status:
+        flash('An error occurred. ' + message, 'danger')
+    else:
+        flash(f'{len(show_ids)} shows were successfully listed!', 'success')
+
+    return redirect(url_for('index'))
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -609,16 +937,48 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('rebuild-facets')
+def rebuild_facets_command():
+    """Recompute the genre facet counts from the venues and artists tables."""
+    rebuild_genre_facets()
+    db.session.commit()
+
+
+@app.cli.command('rebuild-show-counts')
+def rebuild_show_counts_command():
+    """Recompute the upcoming/past show counts of every venue and artist."""
+    rebuild_show_counts()
+    db.session.commit()
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Rows inserted per transaction.')
+@click.option('--start-line', default=1, show_default=True,
+              help='Skip the rows before this line, to resume a stopped import.')
+def import_command(kind, path, chunk_size, start_line):
+    """Bulk load venues, artists or shows from a .csv or .jsonl file."""
+    def report(line_num, message):
+        click.echo(f'{path}:{line_num}: {message}', err=True)
+
+    try:
+        imported, rejected = import_rows(kind, read_rows(path), chunk_size, report, start_line)
+    except ImportAborted as e:
+        # the DBAPI error, without the statement and its parameters
+        error = str(getattr(e.__cause__, 'orig', e.__cause__)).strip()
+        raise click.ClickException(
+            f'{path}:{e.resume_line}: {error}\n'
+            f'Imported {e.imported} {kind}, rejected {e.rejected} rows before the failed chunk. '
+            f'Fix the file and rerun with --start-line {e.resume_line} to import the rest.')
+    click.echo(f'Imported {imported} {kind}, rejected {rejected} rows.')
+
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -0,0 +1,345 @@
+import asyncio
+import threading
+import time
+from itertools import cycle
+from flask import render_template
+from itsdangerous import BadSignature
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware, build_environ
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import is_resource_modified
+from api import FORMATS, export_header, export_headers, export_rows, export_statement
+from app import app as flask_app, artist_page, catalogue_filters, page_cache, venue_areas, venue_page
+from cache import MISSING
+from conditional import (artist_validators_statement, page_cache_key, validator_headers,
+                         validators_from_row, venue_validators_statement)
+from facets import genre_facets_statement, order_genre_facets
+from filters import format_show_times
+from logs import stop_logging
+from metrics import discard_request
+from models import Artist, Show, Venue
+from pagination import keyset_result, keyset_statement
+from search import TRIGRAM_CHECK, search_results, search_statements
+import queries
+
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#----------------------------------------------------------------------------#
+
+# Optional async serving mode, e.g. `uvicorn asgi:application`, with the
+# packages in requirements-async.txt. The read-only pages and the export API
+# run on SQLAlchemy's asyncio engine (asyncpg), so a process waits on the
+# database without holding a thread per request, and the independent
+# queries of a page run concurrently, each on its own connection. The pages
+# are rendered from the same templates, statements and page cache as the
+# Flask views.
+# Everything else is served by the Flask app, mounted underneath: writes,
+# forms, static files, and any read that has to see the requester's own
+# session (a pending flash message, or a recent write that a replica may
+# not have yet), so those behave exactly as in the WSGI deployment.
+# The async views themselves run inside a Flask request context for their
+# request, between Flask's before_request and after_request/teardown
+# hooks (see in_request_cycle()). Request ids, logs, metrics and the SQL
+# instrumentation, query budgets included, therefore treat them like any
+# Flask request; SQLAlchemy's async engine fires the same cursor events.
+
+
+def _async_engine(uri):
+    options = {key: value for key, value in flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'].items()
+               if key not in ('poolclass', 'connect_args')}
+    return create_async_engine(
+        uri.replace('postgresql://', 'postgresql+asyncpg://', 1),
+        connect_args={'server_settings': {
+            'statement_timeout': str(flask_app.config['DB_STATEMENT_TIMEOUT'])}},
+        **options)
+
+
+# reads use the replicas when there are any, round-robin per request
+engines = [_async_engine(uri) for uri in
+           flask_app.config['SQLALCHEMY_REPLICA_URIS'] or [flask_app.config['SQLALCHEMY_DATABASE_URI']]]
+_next_engine = cycle(engines)
+_engine_lock = threading.Lock()
+
+flask = WSGIMiddleware(flask_app)
+
+
+def _engine(request):
+    if 'engine' not in request.scope:
+        with _engine_lock:
+            request.scope['engine'] = next(_next_engine)
+    return request.scope['engine']
+
+
+async def fetch_all(request, stmt):
+    async with _engine(request).connect() as conn:
+        return (await conn.execute(stmt)).all()
+
+
+async def fetch_one(request, stmt):
+    async with _engine(request).connect() as conn:
+        return (await conn.execute(stmt)).first()
+
+
+async def fetch_scalar(request, stmt):
+    async with _engine(request).connect() as conn:
+        return (await conn.execute(stmt)).scalar()
+
+
+def full_path(request):
+    # the page cache key Flask's request.full_path gives the same page
+    return request.url.path + '?' + request.url.query
+
+
+def render(request, template, **context):
+    # renders with Flask's environment in the request context set up by
+    # in_request_cycle(), so url_for(), request.endpoint, filters and
+    # {% cache %} blocks behave as under the Flask views
+    return HTMLResponse(render_template(template, **context))
+
+
+def _process_response(response):
+    # applies Flask's after_request hooks to an ASGI response; they only
+    # add headers (Server-Timing, X-Request-ID) and read the status
+    shell = flask_app.response_class(status=response.status_code)
+    shell.headers.clear()
+    for key, value in flask_app.process_response(shell).headers.items():
+        response.headers.append(key, value)
+    return response
+
+
+async def in_request_cycle(view, request):
+    # Runs an async view as Flask runs its views: in a request context
+    # built from the ASGI request, after the before_request hooks, with the
+    # after_request hooks applied to its response and the teardown hooks
+    # run at the end. A request the view hands to Flask (None) is left for
+    # Flask to record when it serves it.
+    ctx = flask_app.request_context(build_environ(request.scope, b''))
+    ctx.push()
+    try:
+        flask_app.preprocess_request()
+        response = await view(request)
+        if response is None:
+            discard_request()
+            return None
+        return _process_response(response)
+    finally:
+        ctx.pop()
+
+
+def _pinned(request):
+    # True if the Flask session asks for a flash message or the primary
+    session_cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not session_cookie:
+        return False
+    try:
+        session = flask_app.session_interface.get_signing_serializer(flask_app).loads(session_cookie)
+    except BadSignature:
+        return False
+    return '_flashes' in session or session.get('_primary_until', 0) >= time.time()
+
+
+class ReadView(object):
+    # ASGI app of an async view, run by in_request_cycle(); a view returning
+    # None, or a request pinned to the Flask session, is handed to the Flask
+    # app instead
+
+    def __init__(self, view):
+        self.view = view
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        response = None if _pinned(request) else await in_request_cycle(self.view, request)
+        if response is None:
+            await flask(scope, receive, send)
+        else:
+            await response(scope, receive, send)
+
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+
+async def venues(request):
+    key = full_path(request)
+    context = page_cache.get(key)
+    if context is MISSING:
+        filters = catalogue_filters(request.query_params)
+        rows, facets = await asyncio.gather(
+            fetch_all(request, queries.venue_directory(filters)),
+            fetch_all(request, genre_facets_statement('venue')))
+        context = {'areas': venue_areas(rows), 'filters': filters,
+                   'facets': order_genre_facets(facets)}
+        page_cache.set(key, context)
+    return render(request, 'pages/venues.html', **context)
+
+
+async def artists(request):
+    key = full_path(request)
+    context = page_cache.get(key)
+    if context is MISSING:
+        filters = catalogue_filters(request.query_params)
+        rows, facets = await asyncio.gather(
+            fetch_all(request, queries.artist_directory(filters)),
+            fetch_all(request, genre_facets_statement('artist')))
+        context = {'artists': rows, 'filters': filters, 'facets': order_genre_facets(facets)}
+        page_cache.set(key, context)
+    return render(request, 'pages/artists.html', **context)
+
+
+async def _detail(request, validators_statement, entity_statement, shows_statement,
+                  build, template, name):
+    # a missing entity is left to Flask, which flashes and redirects
+    validators = validators_from_row(await fetch_one(request, validators_statement))
+    if validators is None:
+        return None
+
+    environ = {'REQUEST_METHOD': request.method}
+    for header in ('if-none-match', 'if-modified-since'):
+        if header in request.headers:
+            environ['HTTP_' + header.upper().replace('-', '_')] = request.headers[header]
+    if not is_resource_modified(environ, etag=validators[0], last_modified=validators[1]):
+        return Response(status_code=304, headers=validator_headers(*validators))
+
+    key = page_cache_key(full_path(request), validators[0])
+    data = page_cache.get(key)
+    if data is MISSING:
+        entity, shows = await asyncio.gather(
+            fetch_one(request, entity_statement), fetch_all(request, shows_statement))
+        data = build(entity, shows)
+        page_cache.set(key, data)
+
+    response = render(request, template, **{name: data})
+    response.headers.update(validator_headers(*validators))
+    return response
+
+
+async def show_venue(request):
+    venue_id = request.path_params['venue_id']
+    return await _detail(request, venue_validators_statement(venue_id), queries.venue(venue_id),
+                         queries.venue_shows(venue_id), venue_page, 'pages/show_venue.html', 'venue')
+
+
+async def show_artist(request):
+    artist_id = request.path_params['artist_id']
+    return await _detail(request, artist_validators_statement(artist_id), queries.artist(artist_id),
+                         queries.artist_shows(artist_id), artist_page, 'pages/show_artist.html', 'artist')
+
+
+async def shows(request):
+    args = request.query_params
+    when = args.get('when', 'all')
+    key = full_path(request)
+    context = page_cache.get(key)
+    if context is MISSING:
+        per_page = flask_app.config['SHOWS_PER_PAGE']
+        try:
+            stmt = keyset_statement(
+                queries.show_feed(when, args.get('city'), args.get('start_date'), args.get('end_date')),
+                Show.start_time, Show.id, args.get('cursor'), per_page, descending=(when == 'past'))
+        except ValueError:
+            return None  # Flask flashes the error
+        data, next_cursor = keyset_result(
+            await fetch_all(request, stmt), Show.start_time, Show.id, per_page)
+        filters = {'when': when, 'city': args.get('city'),
+                   'start_date': args.get('start_date'), 'end_date': args.get('end_date')}
+        context = {'shows': format_show_times([d._asdict() for d in data]),
+                   'filters': filters, 'next_cursor': next_cursor}
+        page_cache.set(key, context)
+    return render(request, 'pages/shows.html', **context)
+
+
+async def _search(request, model, template):
+    search_term = request.query_params.get('search_term', '')
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    per_page = flask_app.config['SEARCH_RESULTS_PER_PAGE']
+
+    count, data = search_statements(model, search_term, page, per_page,
+                                    flask_app.extensions.get('pg_trgm', False))
+    count, data = await asyncio.gather(fetch_scalar(request, count), fetch_all(request, data))
+    return render(request, template, search_term=search_term,
+                  results=search_results(count, data, page, per_page))
+
+
+async def search_venues(request):
+    return await _search(request, Venue, 'pages/search_venues.html')
+
+
+async def search_artists(request):
+    return await _search(request, Artist, 'pages/search_artists.html')
+
+
+async def export(request):
+    kind = request.path_params['kind']
+    try:
+        stmt, columns, output = export_statement(kind, request.query_params)
+    except KeyError:
+        return None  # Flask renders the 404 page
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    chunk_size = flask_app.config['EXPORT_CHUNK_SIZE']
+    # the query starts within the request cycle, as in the Flask view, so
+    # it is instrumented; the rows are read as the body is sent
+    conn = await _engine(request).connect()
+    try:
+        result = await conn.stream(stmt)
+    except Exception:
+        await conn.close()
+        raise
+
+    async def chunks():
+        try:
+            yield export_header(columns, output)
+            async for rows in result.partitions(chunk_size):
+                yield export_rows(rows, columns, output)
+        finally:
+            await conn.close()
+
+    return StreamingResponse(chunks(), media_type=FORMATS[output],
+                             headers=export_headers(kind, output))
+
+
+async def check_search_ranking():
+    # search ranks by similarity() only where pg_trgm is installed
+    async with engines[0].connect() as conn:
+        flask_app.extensions['pg_trgm'] = (await conn.execute(TRIGRAM_CHECK)).scalar()
+
+
+async def dispose_engines():
+    for engine in engines:
+        await engine.dispose()
+
+
+def stop_flask_logging():
+    stop_logging(flask_app)
+
+
+reads = Starlette(
+    routes=[
+        Route('/venues', ReadView(venues)),
+        Route('/venues/search', ReadView(search_venues)),
+        Route('/venues/{venue_id:int}', ReadView(show_venue)),
+        Route('/artists', ReadView(artists)),
+        Route('/artists/search', ReadView(search_artists)),
+        Route('/artists/{artist_id:int}', ReadView(show_artist)),
+        Route('/shows', ReadView(shows)),
+        Route('/api/v1/{kind}/export', ReadView(export)),
+        Mount('/', app=flask),
+    ],
+    on_startup=[check_search_ranking],
+    on_shutdown=[dispose_engines, stop_flask_logging])
+
+
+async def application(scope, receive, send):
+    # only GET and HEAD requests are candidates for the async views
+    if scope['type'] == 'http' and scope['method'] not in ('GET', 'HEAD'):
+        await flask(scope, receive, send)
+    else:
+        await reads(scope, receive, send)
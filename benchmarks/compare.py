@@ -0,0 +1,71 @@
+"""Compare two benchmarks.routes result files.
+
+Prints per-route p50/p99 latency, throughput and queries per request of
+the baseline and the candidate, and exits with status 1 when any route's
+p50 or p99 got slower by more than --threshold percent or runs more
+queries per request, so it can gate a CI job.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+"""
+import argparse
+import json
+import sys
+
+
+def _change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(baseline, candidate, threshold):
+    # [(route, rows, regressed)]; rows are (metric, old, new, change %)
+    report = []
+    for route in sorted(set(baseline['routes']) | set(candidate['routes'])):
+        old = baseline['routes'].get(route)
+        new = candidate['routes'].get(route)
+        if old is None or new is None:
+            report.append((route, [], False))
+            continue
+        rows = [(metric, old[metric], new[metric], _change(old[metric], new[metric]))
+                for metric in ('p50_ms', 'p99_ms', 'throughput_rps', 'queries_per_request')]
+        regressed = (
+            rows[0][3] > threshold or rows[1][3] > threshold or
+            new['queries_per_request'] > old['queries_per_request'])
+        report.append((route, rows, regressed))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='allowed latency increase in percent')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline['options'] != candidate['options'] or baseline['catalogue'] != candidate['catalogue']:
+        print('warning: runs used different options or catalogues', file=sys.stderr)
+
+    print('%-24s %-20s %10s %10s %8s' % (
+        'route', 'metric', baseline['commit'], candidate['commit'], 'change'))
+    regressions = []
+    for route, rows, regressed in compare(baseline, candidate, args.threshold):
+        if not rows:
+            print('%-24s only in one run' % route)
+            continue
+        for metric, old, new, change in rows:
+            print('%-24s %-20s %10.2f %10.2f %+7.1f%%' % (route, metric, old, new, change))
+        if regressed:
+            regressions.append(route)
+
+    if regressions:
+        print('\nRegressed: ' + ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Per-tile cost of the `datetime` template filter.
+
+Compares the old path (views stringify start_time, the filter parses it
+back with dateutil and calls babel.dates.format_datetime) with the
+cached formatter on datetime objects, one call per tile and batched over
+a page of shows.
+
+    python -m benchmarks.datetime_filter [--tiles 30] [--repeat 200]
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+import babel.dates
+import dateutil.parser
+from filters import DATETIME_FORMATS, format_datetime, format_show_times
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[format], locale='en')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tiles', type=int, default=30, help='shows per page')
+    parser.add_argument('--repeat', type=int, default=200, help='pages rendered')
+    args = parser.parse_args()
+
+    start = datetime(2026, 10, 18, 20, 0)
+    times = [start + timedelta(days=i // 3, hours=i % 3) for i in range(args.tiles)]
+    strings = [str(t) for t in times]
+
+    assert [legacy_format_datetime(s, 'full') for s in strings] == \
+        [format_datetime(t, 'full') for t in times]
+
+    cases = {
+        'legacy (str -> parse -> babel)': lambda: [legacy_format_datetime(s, 'full') for s in strings],
+        'cached formatter per tile': lambda: [format_datetime(t, 'full') for t in times],
+        'batch per page': lambda: format_show_times([{'start_time': t} for t in times]),
+    }
+
+    tiles = args.tiles * args.repeat
+    baseline = None
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=args.repeat, repeat=3))
+        per_tile = seconds / tiles * 1e6
+        baseline = baseline or per_tile
+        print(f'{name:<32} {per_tile:8.2f} us/tile  {baseline / per_tile:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Seeded synthetic catalogue for benchmarks.
+
+Fills the configured database (or --database-uri) with venues, artists and
+shows at a named scale. The same --seed always yields the same catalogue:
+names built from word lists, real city/state pairs, genres from the form
+vocabulary, popularity skewed so a few venues and artists have most of the
+shows, and start times spread over the year before and after today.
+
+    python -m benchmarks.generate --scale small [--seed 1] [--reset]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from app import app
+from facets import rebuild_genre_facets
+from forms import GENRE_CHOICES
+from models import db, Artist, Show, Venue
+from showcounts import rebuild_show_counts
+
+# (venues, artists, shows)
+SCALES = {
+    'tiny': (100, 200, 2000),
+    'small': (1000, 2000, 20000),
+    'medium': (10000, 20000, 200000),
+    'large': (100000, 200000, 1000000),
+}
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('New York', 'NY'), ('Brooklyn', 'NY'),
+    ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+    ('Portland', 'OR'), ('Nashville', 'TN'), ('Memphis', 'TN'), ('New Orleans', 'LA'),
+    ('Atlanta', 'GA'), ('Miami', 'FL'), ('Denver', 'CO'), ('Boston', 'MA'),
+    ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Philadelphia', 'PA'), ('Washington', 'DC'),
+]
+
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Crimson', 'Wild',
+              'Lucky', 'Broken', 'Hidden', 'Neon', 'Rusty', 'Quiet', 'Burning', 'Little']
+NOUNS = ['Owl', 'Lantern', 'Harbor', 'Hop', 'Room', 'Garden', 'Anchor', 'Whistle',
+         'Saloon', 'Cellar', 'Attic', 'Echo', 'Tavern', 'Stage', 'Parlor', 'Factory']
+VENUE_KINDS = ['Hall', 'Club', 'Lounge', 'Theatre', 'Bar', 'Live', 'Music & Coffee', 'Arena']
+FIRST_NAMES = ['Guns N', 'The', 'Matt', 'Quevedo', 'Sarah', 'Lil', 'DJ', 'Los', 'Mama', 'Johnny']
+BAND_NOUNS = ['Petals', 'Wolves', 'Kings', 'Tides', 'Machines', 'Sisters', 'Ghosts', 'Comets',
+              'Rivers', 'Bandits', 'Saints', 'Strangers']
+
+GENRES = [genre for genre, _ in GENRE_CHOICES]
+
+CHUNK_SIZE = 10000
+
+SHOW_HOURS = 2
+
+
+def _name(rng, *words):
+    return ' '.join(rng.choice(choices) for choices in words)
+
+
+def _genres(rng):
+    return rng.sample(GENRES, rng.choice((1, 1, 2, 2, 3)))
+
+
+def _venues(rng, count):
+    for i in range(count):
+        city, state = rng.choice(CITIES)
+        yield {
+            'name': f'{_name(rng, ADJECTIVES, NOUNS, VENUE_KINDS)} {i}',
+            'city': city, 'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(NOUNS)} Street',
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://images.example.com/venues/{i}.jpg',
+            'facebook_link': f'https://www.facebook.com/venue{i}',
+            'website': f'https://venue{i}.example.com',
+            'genres': _genres(rng),
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': 'We are looking for local acts.',
+        }
+
+
+def _artists(rng, count):
+    created_on = datetime.utcnow() - timedelta(days=365)
+    for i in range(count):
+        city, state = rng.choice(CITIES)
+        yield {
+            'name': f'{_name(rng, FIRST_NAMES, ADJECTIVES, BAND_NOUNS)} {i}',
+            'city': city, 'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://images.example.com/artists/{i}.jpg',
+            'facebook_link': f'https://www.facebook.com/artist{i}',
+            'website': f'https://artist{i}.example.com',
+            'genres': _genres(rng),
+            'seeking_venue': rng.random() < 0.3,
+            'seeking_description': 'Looking for shows.',
+            'created_on': created_on,
+        }
+
+
+def _popular(rng, ids):
+    # skewed pick: the first 10% of ids get about a third of the shows
+    return ids[int(len(ids) * rng.random() ** 2)]
+
+
+def _shows(rng, count, venue_ids, artist_ids):
+    # Shows fill two-hour slots, and a venue or an artist never gets the
+    # same slot twice, so no two of their shows overlap.
+    # shuffled once so popularity is not correlated with id order
+    venue_ids = venue_ids[:]
+    artist_ids = artist_ids[:]
+    rng.shuffle(venue_ids)
+    rng.shuffle(artist_ids)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    slots = 365 * 24 // SHOW_HOURS
+    taken = set()
+    for _ in range(count):
+        venue_id = _popular(rng, venue_ids)
+        artist_id = _popular(rng, artist_ids)
+        slot = rng.randint(-slots, slots)
+        while ('venue', venue_id, slot) in taken or ('artist', artist_id, slot) in taken:
+            slot = rng.randint(-slots, slots)
+        taken.update((('venue', venue_id, slot), ('artist', artist_id, slot)))
+        start_time = now + timedelta(hours=slot * SHOW_HOURS)
+        yield {
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start_time,
+            'end_time': start_time + timedelta(hours=SHOW_HOURS),
+        }
+
+
+def _insert(model, rows):
+    table = model.__table__
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+    db.session.commit()
+    return [row_id for row_id, in db.session.query(model.id).order_by(model.id)]
+
+
+def generate(scale, seed):
+    venues, artists, shows = SCALES[scale]
+    rng = random.Random(seed)
+
+    venue_ids = _insert(Venue, _venues(rng, venues))
+    artist_ids = _insert(Artist, _artists(rng, artists))
+    _insert(Show, _shows(rng, shows, venue_ids, artist_ids))
+
+    rebuild_genre_facets()
+    rebuild_show_counts()
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('ANALYZE venues, artists, shows, genre_facets, show_counts')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-uri', help='defaults to SQLALCHEMY_DATABASE_URI')
+    parser.add_argument('--reset', action='store_true',
+                        help='empty the venues, artists and shows tables first')
+    args = parser.parse_args()
+
+    if args.database_uri:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+
+    with app.app_context():
+        if args.reset:
+            db.session.execute('TRUNCATE shows, venues, artists, genre_facets, show_counts RESTART IDENTITY')
+            db.session.commit()
+        elif db.session.query(Venue.id).first() or db.session.query(Artist.id).first():
+            sys.exit('The database already has a catalogue; pass --reset to replace it.')
+
+        started = time.perf_counter()
+        generate(args.scale, args.seed)
+        print('Generated %d venues, %d artists and %d shows in %.1fs' % (
+            *SCALES[args.scale], time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Latency, throughput, queries and memory for every route in app.py.
+
+Drives each route through Flask's test client against the configured
+database (fill it with benchmarks.generate first) and reports, per route,
+p50/p99 latency, throughput, queries per request (from the Server-Timing
+header) and the peak memory allocated while handling one request. Results
+are written as JSON, one file per commit, for benchmarks.compare.
+
+    python -m benchmarks.routes [--requests 100] [--concurrency 1]
+                                [--warm] [--only venues,shows] [--output FILE]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import subprocess
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from itertools import count
+from sqlalchemy import func
+from app import app, page_cache
+from models import db, Artist, Show, Venue
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+class Catalogue(object):
+    # ids and names sampled from the database, so every run with the same
+    # seed requests the same pages
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        with app.app_context():
+            self.venue_ids = [i for i, in db.session.query(Venue.id).order_by(Venue.id)]
+            self.artist_ids = [i for i, in db.session.query(Artist.id).order_by(Artist.id)]
+            self.venue_names = [n for n, in db.session.query(Venue.name).order_by(Venue.id).limit(500)]
+            self.cities = [c for c, in db.session.query(Venue.city).distinct()]
+            last_show = db.session.query(func.max(Show.end_time)).scalar() or datetime.now()
+        self.first_show_day = (last_show + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self.show_slots = count()
+        if not self.venue_ids or not self.artist_ids:
+            raise SystemExit('No catalogue found; run python -m benchmarks.generate first.')
+
+    def venue(self):
+        return self.rng.choice(self.venue_ids)
+
+    def artist(self):
+        return self.rng.choice(self.artist_ids)
+
+    def word(self):
+        return self.rng.choice(self.rng.choice(self.venue_names).split()[:-1])
+
+    def start_time(self):
+        # Every call gets its own two-hour slot after the latest show, so no
+        # benchmark show overlaps another: twelve calls share a day, and the
+        # days are 100 days apart, further than a weekly or monthly series
+        # of one call reaches.
+        n = next(self.show_slots)
+        start = self.first_show_day + timedelta(days=100 * (n // 12), hours=2 * (n % 12))
+        return start.strftime('%Y-%m-%d %H:00:00')
+
+
+def _venue_form(name):
+    return {'name': name, 'city': 'Austin', 'state': 'TX', 'address': '1 Bench St',
+            'phone': '512-555-0100', 'genres': ['Jazz', 'Blues'], 'image_link': '',
+            'facebook_link': 'https://www.facebook.com/bench', 'website_link': '',
+            'seeking_description': ''}
+
+
+def _artist_form(name):
+    return {'name': name, 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0100',
+            'genres': ['Jazz'], 'image_link': '', 'facebook_link': 'https://www.facebook.com/bench',
+            'website_link': '', 'seeking_description': ''}
+
+
+# (name, method, request builder); a builder takes the Catalogue and the
+# request number and returns (path, form data or json)
+READ_ROUTES = [
+    ('index', 'GET', lambda c, i: ('/', None)),
+    ('venues', 'GET', lambda c, i: ('/venues', None)),
+    ('venues_filtered', 'GET', lambda c, i: ('/venues?genre=Jazz&city=' + c.rng.choice(c.cities), None)),
+    ('search_venues', 'GET', lambda c, i: ('/venues/search?search_term=' + c.word(), None)),
+    ('search_venues_post', 'POST', lambda c, i: ('/venues/search', {'search_term': c.word()})),
+    ('show_venue', 'GET', lambda c, i: ('/venues/%d' % c.venue(), None)),
+    ('venue_availability', 'GET', lambda c, i: ('/venues/%d/availability?start=%s&end=%s&minutes=60' % (
+        c.venue(), date.today(), date.today() + timedelta(days=6)), None)),
+    ('artists', 'GET', lambda c, i: ('/artists', None)),
+    ('search_artists', 'GET', lambda c, i: ('/artists/search?search_term=' + c.word(), None)),
+    ('show_artist', 'GET', lambda c, i: ('/artists/%d' % c.artist(), None)),
+    ('typeahead', 'GET', lambda c, i: ('/typeahead?q=' + c.word()[:3], None)),
+    ('shows', 'GET', lambda c, i: ('/shows', None)),
+    ('shows_upcoming', 'GET', lambda c, i: ('/shows?when=upcoming', None)),
+    ('shows_past', 'GET', lambda c, i: ('/shows?when=past&city=' + c.rng.choice(c.cities), None)),
+    ('export_shows_since', 'GET', lambda c, i: (
+        '/api/v1/shows/export?since=' + (datetime.utcnow() - timedelta(hours=1)).isoformat(), None)),
+    # whole tables, streamed; peak_alloc_kb should stay flat as they grow
+    ('export_venues', 'GET', lambda c, i: ('/api/v1/venues/export', None)),
+    ('export_artists_csv', 'GET', lambda c, i: ('/api/v1/artists/export?format=csv', None)),
+    ('create_venue_form', 'GET', lambda c, i: ('/venues/create', None)),
+    ('create_artist_form', 'GET', lambda c, i: ('/artists/create', None)),
+    ('create_show_form', 'GET', lambda c, i: ('/shows/create', None)),
+    ('create_recurring_form', 'GET', lambda c, i: ('/shows/create/recurring', None)),
+    ('edit_venue_form', 'GET', lambda c, i: ('/venues/%d/edit' % c.venue(), None)),
+    ('edit_artist_form', 'GET', lambda c, i: ('/artists/%d/edit' % c.artist(), None)),
+    ('metrics', 'GET', lambda c, i: ('/metrics', None)),
+    ('pool_stats', 'GET', lambda c, i: ('/pool/stats', None)),
+    ('cache_stats', 'GET', lambda c, i: ('/cache/stats', None)),
+]
+
+# run after the reads; they only add rows, delete rows the benchmark
+# created and resubmit sampled rows unchanged
+WRITE_ROUTES = [
+    ('create_venue', 'POST', lambda c, i: ('/venues/create', _venue_form('Bench Venue %d' % i))),
+    ('create_artist', 'POST', lambda c, i: ('/artists/create', _artist_form('Bench Artist %d' % i))),
+    ('create_show', 'POST', lambda c, i: ('/shows/create', {
+        'venue_id': c.venue(), 'artist_id': c.artist(), 'start_time': c.start_time()})),
+    ('create_recurring_shows', 'POST', lambda c, i: ('/shows/create/recurring', {
+        'artist_id': c.artist(), 'venue_id': c.venue(), 'start_time': c.start_time(),
+        'frequency': 'weekly', 'count': 8})),
+    ('api_create_shows', 'JSON', lambda c, i: ('/api/v1/shows', {
+        'artist_id': c.artist(), 'venue_id': c.venue(),
+        'start_time': c.start_time().replace(' ', 'T'), 'frequency': 'monthly', 'count': 4})),
+    ('edit_venue', 'POST', lambda c, i: _edit(c, Venue, c.venue())),
+    ('edit_artist', 'POST', lambda c, i: _edit(c, Artist, c.artist())),
+    ('delete_venue', 'DELETE', lambda c, i: ('/venues/%d' % c.bench_venues.pop(), None)),
+]
+
+
+def _edit(c, model, row_id):
+    # resubmits the row's own values, so edits leave the catalogue as it was
+    with app.app_context():
+        row = db.session.query(model).get(row_id)
+        data = {column: getattr(row, column) or '' for column in
+                ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                 'seeking_description')}
+        data.update(genres=row.genres, website_link=row.website or '')
+        if model is Venue:
+            data['address'] = row.address
+    return '/%s/%d/edit' % (model.__tablename__, row_id), data
+
+
+def _request(client, method, path, data):
+    if method == 'GET':
+        return client.get(path)
+    if method == 'JSON':
+        return client.post(path, json=data)
+    if method == 'DELETE':
+        return client.delete(path)
+    return client.post(path, data=data)
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def run_route(catalogue, method, build, requests, concurrency, warm):
+    plans = [build(catalogue, i) for i in range(requests)]
+    latencies = []
+    queries = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(plans):
+        client = app.test_client()
+        for path, data in plans:
+            if not warm:
+                page_cache.clear()
+                app.jinja_env.fragment_cache.clear()
+            started = time.perf_counter()
+            response = _request(client, method, path, data)
+            response.get_data()
+            elapsed = time.perf_counter() - started
+            match = QUERIES.search(response.headers.get('Server-Timing', ''))
+            # write handlers redirect either way; a flashed error is a failure
+            status = str(response.status_code)
+            with client.session_transaction() as session:
+                if any(category == 'danger' for category, _ in session.pop('_flashes', [])):
+                    status += ' (error flashed)'
+            with lock:
+                latencies.append(elapsed)
+                queries.append(int(match.group(1)) if match else 0)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(plans[i::concurrency],))
+               for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    # one more request under tracemalloc for its allocation peak
+    path, data = build(catalogue, requests)
+    if not warm:
+        page_cache.clear()
+    tracemalloc.start()
+    _request(app.test_client(), method, path, data).get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'requests': requests,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'throughput_rps': requests / wall,
+        'queries_per_request': sum(queries) / len(queries),
+        'peak_alloc_kb': peak / 1024,
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(__file__), text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads')
+    parser.add_argument('--warm', action='store_true',
+                        help='keep the page and fragment caches between requests')
+    parser.add_argument('--only', help='comma-separated route names')
+    parser.add_argument('--no-writes', action='store_true', help='skip the write routes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='defaults to benchmarks/results/<commit>.json')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.logger.setLevel(logging.WARNING)
+    catalogue = Catalogue(args.seed)
+
+    routes = READ_ROUTES + ([] if args.no_writes else WRITE_ROUTES)
+    if args.only:
+        names = args.only.split(',')
+        routes = [route for route in routes if route[0] in names]
+
+    results = {}
+    for name, method, build in routes:
+        if name == 'delete_venue':
+            # deletes the venues create_venue made, never generated ones
+            with app.app_context():
+                catalogue.bench_venues = [i for i, in db.session.query(Venue.id).filter(
+                    Venue.name.like('Bench Venue %')).order_by(Venue.id)]
+            if len(catalogue.bench_venues) < args.requests + 1:
+                continue
+        results[name] = run_route(catalogue, method, build, args.requests,
+                                  args.concurrency, args.warm)
+        r = results[name]
+        print('%-24s p50 %8.2f ms  p99 %8.2f ms  %8.1f req/s  %5.1f queries  %8.0f KiB' % (
+            name, r['p50_ms'], r['p99_ms'], r['throughput_rps'],
+            r['queries_per_request'], r['peak_alloc_kb']))
+
+    with app.app_context():
+        scale = {model.__tablename__: db.session.query(model.id).count() for model in (Venue, Artist)}
+    report = {
+        'commit': _commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'options': {'requests': args.requests, 'concurrency': args.concurrency,
+                    'warm': args.warm, 'seed': args.seed},
+        'catalogue': scale,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'routes': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, report['commit'] + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('Results written to', output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import Response, request, session
+from sqlalchemy import and_, func, select
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+from models import db, Artist, ShowCount, Venue
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# A detail page depends on its own row, on its shows and on the
+# counterparts (artists of a venue, venues of an artist) on those shows.
+# One query of index lookups yields a strong ETag and a Last-Modified time,
+# so a revalidation is answered with 304 before the page data is loaded:
+# - the row's version and updated_at,
+# - its show_counts row, which every added or removed show changes, and
+#   whose next_show_at tells when the next show moves to the past,
+# - the latest updated_at of the counterpart table. An edit of any artist
+#   changes the validators of every venue page, and vice versa, which
+#   costs some extra full responses but no per-show aggregation.
+# A show that starts after the next one, before the roller recounts the
+# row (SHOW_COUNTS_ROLL_INTERVAL), is picked up with that recount.
+
+
+def _validators_statement(owner, kind, counterpart, owner_id):
+    return select(
+        owner.version,
+        owner.updated_at,
+        ShowCount.upcoming,
+        ShowCount.past,
+        ShowCount.next_show_at,
+        select(func.max(counterpart.updated_at)).scalar_subquery()
+    ).select_from(owner).outerjoin(ShowCount, and_(
+        ShowCount.kind == kind, ShowCount.owner_id == owner.id
+    )).where(owner.id == owner_id)
+
+
+def validators_from_row(row):
+    # (etag, last_modified) from the validator row, None if there was none
+    if row is None:
+        return None
+
+    version, updated_at, upcoming, past, next_show_at, counterparts_updated_at = row
+    started = next_show_at is not None and next_show_at <= datetime.now()
+    etag = hashlib.sha1('|'.join(map(str, (*row, started))).encode()).hexdigest()
+
+    # the page also changes when its next show moves from upcoming to past;
+    # start times are local, the updated_at columns are UTC
+    changes = [t.replace(tzinfo=timezone.utc) for t in
+               (updated_at, counterparts_updated_at) if t]
+    if started:
+        changes.append(next_show_at.astimezone(timezone.utc))
+
+    return etag, max(changes)
+
+
+def venue_validators_statement(venue_id):
+    return _validators_statement(Venue, 'venue', Artist, venue_id)
+
+
+def artist_validators_statement(artist_id):
+    return _validators_statement(Artist, 'artist', Venue, artist_id)
+
+
+def venue_validators(venue_id):
+    # (etag, last_modified) of /venues/<venue_id>, or None if there is no venue
+    return validators_from_row(db.session.execute(venue_validators_statement(venue_id)).first())
+
+
+def artist_validators(artist_id):
+    # (etag, last_modified) of /artists/<artist_id>, or None if there is no artist
+    return validators_from_row(db.session.execute(artist_validators_statement(artist_id)).first())
+
+
+def page_cache_key(path, etag):
+    # Detail page data is cached per ETag, so a response never pairs fresh
+    # validators with data cached before a change that no handler of this
+    # worker invalidated (another worker's write, a show starting). The
+    # path prefix keeps invalidate_prefix() working.
+    return f'{path}#{etag}'
+
+
+def has_pending_flash():
+    # a page that will render a flash message differs from the cached copy,
+    # so it is neither answered with 304 nor given validators
+    return '_flashes' in session
+
+
+def not_modified(etag, last_modified):
+    # a 304 response if the client's copy is current, else None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return set_validators(Response(status=304), etag, last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    # clients and proxies may store the page but must revalidate it
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def validator_headers(etag, last_modified):
+    # the headers set_validators() adds, for responses built outside Flask
+    return {
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': 'public, no-cache'
+    }
@@ -12,3 +12,83 @@ DEBUG = True
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://niffy@localhost:5432/fyyur_project'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per worker process; keep workers x (pool_size +
+# max_overflow) below Postgres max_connections. Override through the
+# environment when sizing a deployment. Queries running longer than
+# statement_timeout (ms) are cancelled by the server.
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': True,
+    'connect_args': {
+        'options': '-c statement_timeout=%d' % DB_STATEMENT_TIMEOUT
+    },
+}
+
+# Read replicas for GET/HEAD requests (space-separated URIs), see routing.py.
+# A client's reads stay on the primary for REPLICA_STICKY_SECONDS after it
+# writes, which should exceed the usual replication lag.
+SQLALCHEMY_REPLICA_URIS = os.environ.get('DB_REPLICA_URIS', '').split()
+REPLICA_STICKY_SECONDS = 5
+
+# Raise instead of silently lazy loading a relationship that a view did not
+# ask for, to catch N+1 query patterns. None turns it on under DEBUG and
+# TESTING only; True/False force it on or off.
+SQLALCHEMY_RAISE_ON_LAZY_LOAD = None
+
+# Number of shows per page of the /shows feed.
+SHOWS_PER_PAGE = 30
+
+# Number of results per page of venue and artist search.
+SEARCH_RESULTS_PER_PAGE = 20
+
+# In-memory typeahead index: maximum number of venue and artist names held
+# per worker, and number of suggestions returned per lookup.
+TYPEAHEAD_MAX_ENTRIES = 200000
+TYPEAHEAD_RESULTS = 10
+# Seconds between checks for venue/artist changes made through other
+# workers, which reload the index; 0 disables the check.
+TYPEAHEAD_REFRESH_INTERVAL = 30
+
+# Per-worker cache of listing and detail page data: maximum number of pages
+# kept and seconds before an entry expires. Set the size to 0 to disable.
+PAGE_CACHE_MAX_ENTRIES = 1024
+PAGE_CACHE_TTL = 60
+
+# Per-worker cache of rendered template fragments ({% cache %} blocks).
+# Keys carry row versions, so the TTL only bounds memory held by entries
+# nobody asks for any more.
+FRAGMENT_CACHE_MAX_ENTRIES = 10000
+FRAGMENT_CACHE_TTL = 3600
+
+# Rows fetched per server-side cursor batch and written per streamed chunk
+# by the /api/v1/<table>/export endpoints.
+EXPORT_CHUNK_SIZE = 1000
+
+# Upper bound on the shows one recurring/bulk show request may create.
+MAX_RECURRING_SHOWS = 500
+
+# Per-request SQL instrumentation, see instrumentation.py. A statement run
+# more often than this in one request is logged as a likely N+1 pattern.
+SQL_REPEATED_STATEMENT_THRESHOLD = 5
+# Fail requests whose view exceeds its @query_budget (always on when TESTING).
+SQL_ENFORCE_QUERY_BUDGETS = False
+
+# Structured logging, see logs.py: JSON lines written to LOG_FILE by a
+# background thread, records below LOG_LEVEL are dropped.
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+# Seconds between recounts of the venues and artists whose next show has
+# started, see showcounts.py; this bounds how long a listing can count a
+# started show as upcoming. Set to 0 to disable the background thread.
+SHOW_COUNTS_ROLL_INTERVAL = 60
+
+# Length in minutes of a show entered without an end time.
+SHOW_DEFAULT_DURATION = 120
+# Longest date range, in days, one /venues/<id>/availability request covers.
+AVAILABILITY_MAX_DAYS = 92
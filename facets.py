@@ -0,0 +1,84 @@
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from forms import GENRE_CHOICES
+from models import db, Artist, GenreFacet, Venue
+
+#----------------------------------------------------------------------------#
+# Genre facets.
+#----------------------------------------------------------------------------#
+
+# Sidebar counts for /venues and /artists come from the genre_facets table.
+# Writes adjust it in the same transaction as the row they change, so a
+# page view reads at most a few dozen facet rows rather than aggregating
+# every genres array in the catalogue.
+
+MODELS = {'venue': Venue, 'artist': Artist}
+
+
+def update_genre_facets(kind, old_genres, new_genres):
+    # applies the difference between a row's old and new genres; pass
+    # None/[] as old_genres on insert and as new_genres on delete
+    old_genres = set(old_genres or [])
+    new_genres = set(new_genres or [])
+
+    for genre in new_genres - old_genres:
+        stmt = insert(GenreFacet).values(kind=kind, genre=genre, count=1)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[GenreFacet.kind, GenreFacet.genre],
+            set_={'count': GenreFacet.count + 1}))
+
+    for genre in old_genres - new_genres:
+        db.session.execute(GenreFacet.__table__.update().where(
+            GenreFacet.kind == kind, GenreFacet.genre == genre
+        ).values(count=GenreFacet.count - 1))
+
+
+def increment_genre_facets(kind, counts):
+    # adds {genre: n} to the counts in one statement, for bulk inserts
+    if not counts:
+        return
+    stmt = insert(GenreFacet).values(
+        [{'kind': kind, 'genre': genre, 'count': n} for genre, n in counts.items()])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[GenreFacet.kind, GenreFacet.genre],
+        set_={'count': GenreFacet.count + stmt.excluded.count}))
+
+
+def filter_catalogue(query, model, filters):
+    # narrows a venue/artist query by the ?genre=, ?city= and ?state= filters;
+    # genres must all be present (array containment, GIN indexed)
+    if filters['genres']:
+        query = query.filter(model.genres.contains(filters['genres']))
+    if filters['city']:
+        query = query.filter(model.city == filters['city'])
+    if filters['state']:
+        query = query.filter(model.state == filters['state'])
+    return query
+
+
+def genre_facets_statement(kind):
+    return select(GenreFacet.genre, GenreFacet.count).where(
+        GenreFacet.kind == kind, GenreFacet.count > 0)
+
+
+def order_genre_facets(rows):
+    # [(genre, count)] in vocabulary order, genres outside it last
+    counts = dict(rows)
+    facets = [(genre, counts.pop(genre)) for genre, _ in GENRE_CHOICES if genre in counts]
+    return facets + sorted(counts.items())
+
+
+def genre_facets(kind):
+    return order_genre_facets(db.session.execute(genre_facets_statement(kind)).all())
+
+
+def rebuild_genre_facets():
+    # recomputes every count from scratch, e.g. after bulk loads
+    db.session.query(GenreFacet).delete()
+    for kind, model in MODELS.items():
+        genre = func.unnest(model.genres).label('genre')
+        genres = select(model.id, genre).subquery()
+        db.session.execute(GenreFacet.__table__.insert().from_select(
+            ['kind', 'genre', 'count'],
+            select(literal(kind), genres.c.genre, func.count(genres.c.id.distinct()))
+            .group_by(genres.c.genre)))
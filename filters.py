@@ -0,0 +1,44 @@
+from functools import lru_cache
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+# Named formats accepted by the `datetime` template filter.
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+@lru_cache(maxsize=64)
+def datetime_formatter(format='medium', locale='en'):
+    # compiled babel pattern and parsed locale, built once per pair
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    locale = Locale.parse(locale)
+    return lambda value: pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    if value is None:
+        return ''
+    # strings are still accepted, but views should pass datetimes
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return datetime_formatter(format, locale)(value)
+
+
+def format_show_times(shows, format='full', locale='en'):
+    # adds a formatted `start_time_display` to every show dict of a page,
+    # formatting each distinct start time once
+    formatter = datetime_formatter(format, locale)
+    formatted = {}
+    for show in shows:
+        start_time = show['start_time']
+        if start_time not in formatted:
+            formatted[start_time] = formatter(start_time)
+        show['start_time_display'] = formatted[start_time]
+    return shows
@@ -0,0 +1,49 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+from cache import MISSING
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+# Adds a {% cache %} tag that stores the rendered HTML of its body:
+#
+#   {% cache 'show-tile', show.id, show.version, show.artist_version %}
+#     ...
+#   {% endcache %}
+#
+# The key is every expression after the tag, so it should include the id
+# and version of each row the fragment renders. Any update to one of those
+# rows bumps its version and therefore changes the key; stale fragments
+# are never read again and age out of the LRU. Without a cache configured
+# on the environment the body renders every time.
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+
+        key = tuple(key)
+        html = cache.get(key)
+        if html is MISSING:
+            html = caller()
+            cache.set(key, html)
+        return html
@@ -0,0 +1,256 @@
+import csv
+import json
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from sqlalchemy.dialects.postgresql import insert
+from werkzeug.datastructures import MultiDict
+from forms import ArtistForm, ShowForm, VenueForm
+from facets import increment_genre_facets
+from models import db, Artist, Show, Venue, show_end_time
+from showcounts import record_new_shows
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Loads venues, artists or shows from CSV or JSON Lines files. Every row is
+# checked by the same form the web UI submits, and valid rows are inserted
+# with one statement per chunk, each chunk in its own transaction, so a
+# bad row is reported and skipped without losing the rest of the file.
+# Shows may name their venue and artist by id (venue_id, artist_id) or by
+# name (venue, artist); the references of a chunk are resolved with one
+# query per table. Shows that would overlap another show of their venue or
+# artist are reported and skipped like invalid rows.
+# CSV files use the column names of the forms (or of the /api/v1 exports)
+# and separate genres with ';'. Web workers see the new rows once their
+# page cache entries expire, and new names in the typeahead at its next
+# version check (TYPEAHEAD_REFRESH_INTERVAL).
+# If inserting a chunk fails (e.g. the database rejects a value the form
+# let through), that chunk is rolled back and the import stops with
+# ImportAborted. The chunks before it stay committed; the error names the
+# first line of the failed chunk, so after fixing the file the run resumes
+# from there with start_line (flask import --start-line).
+
+FORMS = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}
+
+# export column names that differ from the form field names
+ALIASES = {'website': 'website_link'}
+
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'off')
+
+
+class ImportAborted(Exception):
+    # a chunk failed to insert; the rows before resume_line are committed
+
+    def __init__(self, imported, rejected, resume_line):
+        super(ImportAborted, self).__init__(f'import stopped at line {resume_line}')
+        self.imported = imported
+        self.rejected = rejected
+        self.resume_line = resume_line
+
+
+def read_rows(path):
+    # yields (line number, {column: value}) from a .csv or .jsonl file
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_num, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_num, json.loads(line)
+
+
+def _formdata(form, row):
+    # flattens a CSV/JSON row into the MultiDict a browser would have posted
+    data = MultiDict()
+    for column, value in row.items():
+        column = ALIASES.get(column, column)
+        field = getattr(form, column, None)
+        if field is None or value is None:
+            continue
+        if field.type == 'SelectMultipleField':
+            values = value.split(';') if isinstance(value, str) else value
+            data.setlist(column, [v.strip() for v in values if v.strip()])
+        elif field.type == 'BooleanField':
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data[column] = 'y'
+        elif field.type == 'DateTimeField' and isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.strip()).strftime(field.format[0])
+            except ValueError:
+                pass  # left for the form to reject
+            data[column] = value
+        else:
+            data[column] = str(value)
+    return data
+
+
+def _venue_values(form):
+    return {
+        'name': form.name.data, 'city': form.city.data, 'state': form.state.data,
+        'address': form.address.data, 'phone': form.phone.data,
+        'image_link': form.image_link.data, 'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data, 'website': form.website_link.data,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data
+    }
+
+
+def _artist_values(form):
+    return {
+        'name': form.name.data, 'city': form.city.data, 'state': form.state.data,
+        'phone': form.phone.data, 'image_link': form.image_link.data,
+        'genres': form.genres.data, 'facebook_link': form.facebook_link.data,
+        'website': form.website_link.data, 'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data
+    }
+
+
+def _resolve(model, references):
+    # {reference: id or error} for a chunk's venue/artist references, each
+    # either an id (int or digit string) or a name
+    ids = {int(ref) for ref in references if str(ref).isdigit()}
+    names = {ref for ref in references if not str(ref).isdigit()}
+
+    found = set()
+    if ids:
+        found = {row.id for row in db.session.query(model.id).filter(model.id.in_(ids))}
+    by_name = {}
+    if names:
+        for row in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+            by_name.setdefault(row.name, []).append(row.id)
+
+    kind = model.__name__.lower()
+    resolved = {}
+    for ref in references:
+        if str(ref).isdigit():
+            resolved[ref] = int(ref) if int(ref) in found else f'{kind} id {ref} does not exist'
+        elif len(by_name.get(ref, [])) == 1:
+            resolved[ref] = by_name[ref][0]
+        elif ref in by_name:
+            resolved[ref] = f'{kind} name {ref!r} is ambiguous, use {kind}_id'
+        else:
+            resolved[ref] = f'{kind} {ref!r} does not exist'
+    return resolved
+
+
+def _show_values(chunk):
+    # [(line number, values or error)] for a chunk of validated show forms
+    venues = _resolve(Venue, {refs[0] for _, refs, _ in chunk})
+    artists = _resolve(Artist, {refs[1] for _, refs, _ in chunk})
+
+    results = []
+    for line_num, (venue_ref, artist_ref), (start_time, end_time) in chunk:
+        venue_id, artist_id = venues[venue_ref], artists[artist_ref]
+        for resolved in (venue_id, artist_id):
+            if isinstance(resolved, str):
+                results.append((line_num, resolved))
+                break
+        else:
+            results.append((line_num, {
+                'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time,
+                'end_time': end_time or show_end_time(start_time)}))
+    return results
+
+
+def _insert_shows(values):
+    # Inserts the shows that do not overlap an existing show (or an earlier
+    # one of the chunk) of their venue or artist; returns the inserted
+    # values and the indexes of the skipped ones.
+    stmt = insert(Show).values(values).on_conflict_do_nothing().returning(
+        Show.venue_id, Show.artist_id, Show.start_time)
+    inserted = Counter(tuple(row) for row in db.session.execute(stmt))
+
+    kept, skipped = [], []
+    for i, value in enumerate(values):
+        key = (value['venue_id'], value['artist_id'], value['start_time'])
+        if inserted[key]:
+            inserted[key] -= 1
+            kept.append(value)
+        else:
+            skipped.append(i)
+    return kept, skipped
+
+
+def _validate(kind, form, line_num, row):
+    # (line number, values or error) for a single row
+    form.process(_formdata(form, row))
+    if not form.validate():
+        errors = '; '.join(f'{field}: {", ".join(messages)}'
+                           for field, messages in form.errors.items())
+        return line_num, errors
+
+    if kind == 'venues':
+        return line_num, _venue_values(form)
+    if kind == 'artists':
+        return line_num, _artist_values(form)
+
+    # the form falls back to its default (now) for a missing start time
+    if not str(row.get('start_time') or '').strip():
+        return line_num, 'start_time: This field is required.'
+    venue_ref = row.get('venue_id') or row.get('venue')
+    artist_ref = row.get('artist_id') or row.get('artist')
+    if not venue_ref or not artist_ref:
+        return line_num, 'a venue (venue_id or venue) and an artist (artist_id or artist) are required'
+    return line_num, ((venue_ref, artist_ref), (form.start_time.data, form.end_time.data))
+
+
+def import_rows(kind, rows, chunk_size=5000, on_error=None, start_line=1):
+    # Inserts valid rows chunk by chunk, skipping the rows before start_line,
+    # and returns (imported, rejected). on_error(line number, message) is
+    # called for every rejected row.
+    model = {'venues': Venue, 'artists': Artist, 'shows': Show}[kind]
+    form = FORMS[kind](meta={'csrf': False})
+    imported = rejected = 0
+
+    rows = ((line_num, row) for line_num, row in rows if line_num >= start_line)
+    while True:
+        chunk = [_validate(kind, form, line_num, row)
+                 for line_num, row in islice(rows, chunk_size)]
+        if not chunk:
+            break
+        first_line = chunk[0][0]
+        rejected_before = rejected
+
+        if kind == 'shows':
+            valid = [(line_num, result) for line_num, result in chunk
+                     if not isinstance(result, str)]
+            chunk = [item for item in chunk if isinstance(item[1], str)]
+            chunk += _show_values([(line_num, refs, start) for line_num, (refs, start) in valid])
+
+        values = []
+        line_nums = []
+        for line_num, result in sorted(chunk, key=lambda item: item[0]):
+            if isinstance(result, str):
+                rejected += 1
+                if on_error:
+                    on_error(line_num, result)
+            else:
+                values.append(result)
+                line_nums.append(line_num)
+
+        if values:
+            try:
+                if kind != 'shows':
+                    db.session.execute(model.__table__.insert(), values)
+                    increment_genre_facets(kind[:-1], Counter(
+                        genre for value in values for genre in set(value['genres'])))
+                else:
+                    values, skipped = _insert_shows(values)
+                    record_new_shows((value['venue_id'], value['artist_id'], value['start_time'])
+                                     for value in values)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise ImportAborted(imported, rejected_before, first_line) from e
+            imported += len(values)
+            if kind == 'shows':
+                rejected += len(skipped)
+                if on_error:
+                    for i in skipped:
+                        on_error(line_nums[i], 'overlaps another show of the venue or artist')
+
+    return imported, rejected
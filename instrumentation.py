@@ -0,0 +1,111 @@
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# SQL instrumentation.
+#----------------------------------------------------------------------------#
+
+# Every statement a request sends, on any engine, is counted and timed. The
+# totals go out as a Server-Timing header (visible in the browser's network
+# panel) and a log line per request. A statement text repeated more than
+# SQL_REPEATED_STATEMENT_THRESHOLD times in one request is logged as a
+# likely N+1 pattern, and views declare their expected query count with
+# @query_budget(n), which fails the request under app.testing or
+# SQL_ENFORCE_QUERY_BUDGETS and is logged otherwise.
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestStats(object):
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+
+def query_budget(queries):
+    # declares the most queries the decorated view may run per request
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _record(conn, statement):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = g.get('sql_stats') if has_request_context() else None
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+        stats.statements[statement] += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(conn, statement)
+
+
+def _handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute; its start time
+    # must not stay behind on the pooled connection
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        _record(conn, exception_context.statement)
+
+
+def _start_request():
+    g.sql_stats = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+    app = current_app._get_current_object()
+    total = time.perf_counter() - stats.started
+
+    response.headers.add('Server-Timing', 'db;dur=%.2f;desc="%d queries"' % (
+        stats.db_time * 1000, stats.queries))
+    response.headers.add('Server-Timing', 'total;dur=%.2f' % (total * 1000))
+
+    app.logger.info(
+        '%s %s %s queries=%d db_ms=%.2f total_ms=%.2f', request.method, request.path,
+        response.status_code, stats.queries, stats.db_time * 1000, total * 1000,
+        extra={'route': request.endpoint, 'queries': stats.queries,
+               'db_time': stats.db_time, 'duration': total})
+
+    threshold = app.config['SQL_REPEATED_STATEMENT_THRESHOLD']
+    for statement, count in stats.statements.items():
+        if count > threshold:
+            app.logger.warning('possible N+1 in %s: statement ran %d times: %s',
+                               request.endpoint, count, ' '.join(statement.split())[:200])
+
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    if budget is not None and stats.queries > budget:
+        message = '%s ran %d queries, over its budget of %d' % (
+            request.endpoint, stats.queries, budget)
+        if app.testing or app.config['SQL_ENFORCE_QUERY_BUDGETS']:
+            raise QueryBudgetExceeded(message)
+        app.logger.warning(message)
+
+    return response
+
+
+def init_instrumentation(app):
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
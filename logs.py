@@ -0,0 +1,121 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import traceback
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+#----------------------------------------------------------------------------#
+# Logging.
+#----------------------------------------------------------------------------#
+
+# Request threads only put records on an in-memory queue; a listener thread
+# formats them as one JSON object per line and writes them to LOG_FILE, so
+# slow disk I/O never holds up a response. Records are completed in the
+# request thread before they are queued: the message is rendered, the
+# exception is turned into plain fields and the request id, method, path,
+# route and the request's SQL totals so far are attached.
+
+# attributes every LogRecord has; anything else came in through extra=
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = exception_fields(record.exc_info)
+        entry.update((key, value) for key, value in vars(record).items()
+                     if key not in RECORD_ATTRIBUTES)
+        return json.dumps(entry, default=str)
+
+
+def exception_fields(exc_info):
+    exc_type, exc, tb = exc_info
+    return {
+        'type': exc_type.__name__,
+        'message': str(exc),
+        'traceback': ''.join(traceback.format_exception(exc_type, exc, tb))
+    }
+
+
+class RequestQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # runs in the request thread; the queued copy must not need anything
+        # that only lives there (request context, traceback frames)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exception = exception_fields(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            if not hasattr(record, 'route'):
+                record.route = request.endpoint
+            stats = g.get('sql_stats')
+            if stats is not None and not hasattr(record, 'queries'):
+                record.queries = stats.queries
+                record.db_time = stats.db_time
+        return record
+
+
+def _assign_request_id():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+
+def _echo_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def init_logging(app):
+    handler = logging.FileHandler(app.config['LOG_FILE'])
+    handler.setFormatter(JSONFormatter())
+
+    listener = QueueListener(queue.Queue(), handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging, app)
+
+    if not app.debug:
+        # Flask's default handler writes to stderr from the request thread
+        from flask.logging import default_handler
+        app.logger.removeHandler(default_handler)
+    app.logger.addHandler(RequestQueueHandler(listener.queue))
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    app.extensions['log_listener'] = listener
+
+    app.before_request(_assign_request_id)
+    app.after_request(_echo_request_id)
+
+
+def stop_logging(app):
+    # Writes out what is still queued and stops the listener thread. Runs
+    # at exit; call it earlier where the app is torn down before that, e.g.
+    # from a server's worker exit hook. Later records from app.logger fall
+    # back to Python's last-resort stderr handler.
+    listener = app.extensions.pop('log_listener', None)
+    if listener is None:
+        return
+    for handler in list(app.logger.handlers):
+        if isinstance(handler, RequestQueueHandler):
+            app.logger.removeHandler(handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
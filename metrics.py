@@ -0,0 +1,100 @@
+import os
+import time
+from flask import g, request, before_render_template, template_rendered
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# Prometheus metrics for every route, exposed at /metrics. Under a server
+# with several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by the workers before they start. Each worker then
+# writes its values there, and /metrics aggregates all of them whichever
+# worker answers the scrape. The server should call
+# prometheus_client.multiprocess.mark_process_dead(pid) when a worker exits
+# (gunicorn: child_exit hook).
+# Template render time needs blinker for Flask's signals.
+
+REQUEST_LATENCY = Histogram(
+    'fyyur_request_duration_seconds', 'Time to handle a request.',
+    ['endpoint', 'method'])
+REQUESTS = Counter(
+    'fyyur_requests_total', 'Requests handled, by response status.',
+    ['endpoint', 'method', 'status'])
+IN_FLIGHT = Gauge(
+    'fyyur_requests_in_flight', 'Requests being handled.',
+    multiprocess_mode='livesum')
+DB_TIME = Histogram(
+    'fyyur_request_db_duration_seconds', 'Time spent in SQL per request.',
+    ['endpoint'])
+TEMPLATE_TIME = Histogram(
+    'fyyur_template_render_duration_seconds', 'Time to render a template.',
+    ['template'])
+
+
+def _endpoint():
+    # unmatched URLs share one label so 404 scans cannot explode cardinality
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    IN_FLIGHT.dec()
+
+    endpoint = _endpoint()
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    REQUESTS.labels(endpoint, request.method, g.pop('metrics_status', 500)).inc()
+
+    # per-request SQL totals collected by instrumentation.py
+    stats = g.get('sql_stats')
+    if stats is not None:
+        DB_TIME.labels(endpoint).observe(stats.db_time)
+
+
+def discard_request():
+    # forgets the current request without recording it, for a read the
+    # ASGI front end hands on to the Flask app, which records it instead
+    if g.pop('metrics_started', None) is not None:
+        IN_FLIGHT.dec()
+
+
+def _start_render(sender, template, context, **extra):
+    g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+
+def _finish_render(sender, template, context, **extra):
+    renders = g.get('metrics_renders')
+    if renders:
+        TEMPLATE_TIME.labels(template.name).observe(time.perf_counter() - renders.pop())
+
+
+def exposition():
+    # (body, content type) of a scrape, summed over every worker process
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_metrics(app):
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_finish_render, app)
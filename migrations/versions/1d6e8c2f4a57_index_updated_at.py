@@ -0,0 +1,29 @@
+"""index updated_at for incremental exports
+
+Revision ID: 1d6e8c2f4a57
+Revises: f7b3d95e0c21
+Create Date: 2026-10-18 19:04:52.318640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '1d6e8c2f4a57'
+down_revision = 'f7b3d95e0c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for table in ('venues', 'artists', 'shows'):
+            op.create_index(f'ix_{table}_updated_at', table, ['updated_at'],
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('shows', 'artists', 'venues'):
+            op.drop_index(f'ix_{table}_updated_at', table_name=table,
+                          postgresql_concurrently=True)
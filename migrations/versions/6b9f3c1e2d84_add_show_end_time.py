@@ -0,0 +1,42 @@
+"""add show end times and overlap exclusion constraints
+
+Revision ID: 6b9f3c1e2d84
+Revises: a4d2e8f61c39
+Create Date: 2026-10-18 23:12:40.527183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6b9f3c1e2d84'
+down_revision = 'a4d2e8f61c39'
+branch_labels = None
+depends_on = None
+
+# SHOW_DEFAULT_DURATION at the time of this migration
+DEFAULT_DURATION = '120 minutes'
+
+
+def upgrade():
+    # integer equality in a GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute(f"UPDATE shows SET end_time = start_time + interval '{DEFAULT_DURATION}'")
+    op.alter_column('shows', 'end_time', nullable=False)
+    op.create_check_constraint('ck_shows_end_after_start', 'shows', 'end_time > start_time')
+
+    # fails, naming the conflicting rows, if existing shows already overlap;
+    # move or shorten those shows and run the migration again
+    op.execute('ALTER TABLE shows ADD CONSTRAINT ex_shows_venue_overlap '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT ex_shows_artist_overlap '
+               'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    op.drop_constraint('ex_shows_artist_overlap', 'shows')
+    op.drop_constraint('ex_shows_venue_overlap', 'shows')
+    op.drop_constraint('ck_shows_end_after_start', 'shows', type_='check')
+    op.drop_column('shows', 'end_time')
@@ -0,0 +1,50 @@
+"""add indexes for listing, detail, feed and search queries
+
+Revision ID: 8b47d0e5c6a2
+Revises: 3f1c2a9d8e10
+Create Date: 2026-10-18 16:52:37.408921
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8b47d0e5c6a2'
+down_revision = '3f1c2a9d8e10'
+branch_labels = None
+depends_on = None
+
+# Built CONCURRENTLY so that existing tables stay writable while the
+# indexes are created, which requires running outside a transaction.
+INDEXES = [
+    ('ix_shows_start_time_id', 'shows', ['start_time', 'id'], {}),
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], {}),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], {}),
+    ('ix_venues_city_state', 'venues', ['city', 'state'], {}),
+    ('ix_artists_city_state', 'artists', ['city', 'state'], {}),
+    ('ix_venues_genres', 'venues', ['genres'], {'postgresql_using': 'gin'}),
+    ('ix_artists_genres', 'artists', ['genres'], {'postgresql_using': 'gin'}),
+    ('ix_venues_name_trgm', 'venues', ['name'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'name': 'gin_trgm_ops'}}),
+    ('ix_venues_city_trgm', 'venues', ['city'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'city': 'gin_trgm_ops'}}),
+    ('ix_artists_name_trgm', 'artists', ['name'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'name': 'gin_trgm_ops'}}),
+    ('ix_artists_city_trgm', 'artists', ['city'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'city': 'gin_trgm_ops'}}),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns,
+                            postgresql_concurrently=True, **kwargs)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=True)
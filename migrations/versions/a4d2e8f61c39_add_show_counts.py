@@ -0,0 +1,47 @@
+"""add show_counts rollup of upcoming/past shows
+
+Revision ID: a4d2e8f61c39
+Revises: 1d6e8c2f4a57
+Create Date: 2026-10-18 21:37:05.184512
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a4d2e8f61c39'
+down_revision = '1d6e8c2f4a57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('show_counts',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('upcoming', sa.Integer(), nullable=False),
+    sa.Column('past', sa.Integer(), nullable=False),
+    sa.Column('next_show_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('kind', 'owner_id')
+    )
+    op.create_index('ix_show_counts_next_show_at', 'show_counts', ['next_show_at'], unique=False)
+    # seed the counts from the existing shows; start times are local, so
+    # "now" is the application's clock rather than the server's
+    op.get_bind().execute(sa.text("""
+        INSERT INTO show_counts (kind, owner_id, upcoming, past, next_show_at)
+        SELECT 'venue', venue_id, count(*) FILTER (WHERE start_time > :now),
+               count(*) FILTER (WHERE start_time <= :now),
+               min(start_time) FILTER (WHERE start_time > :now)
+        FROM shows GROUP BY venue_id
+        UNION ALL
+        SELECT 'artist', artist_id, count(*) FILTER (WHERE start_time > :now),
+               count(*) FILTER (WHERE start_time <= :now),
+               min(start_time) FILTER (WHERE start_time > :now)
+        FROM shows GROUP BY artist_id
+    """), {'now': datetime.now()})
+
+
+def downgrade():
+    op.drop_index('ix_show_counts_next_show_at', table_name='show_counts')
+    op.drop_table('show_counts')
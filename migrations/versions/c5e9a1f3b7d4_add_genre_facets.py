@@ -0,0 +1,35 @@
+"""add maintained genre facet counts
+
+Revision ID: c5e9a1f3b7d4
+Revises: 8b47d0e5c6a2
+Create Date: 2026-10-18 17:20:11.593846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5e9a1f3b7d4'
+down_revision = '8b47d0e5c6a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('genre_facets',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'genre')
+    )
+    # seed the counts from the existing catalogue
+    op.execute("""
+        INSERT INTO genre_facets (kind, genre, count)
+        SELECT 'venue', genre, count(DISTINCT id) FROM venues, unnest(genres) AS genre GROUP BY genre
+        UNION ALL
+        SELECT 'artist', genre, count(DISTINCT id) FROM artists, unnest(genres) AS genre GROUP BY genre
+    """)
+
+
+def downgrade():
+    op.drop_table('genre_facets')
@@ -0,0 +1,26 @@
+"""add row versions for fragment cache keys
+
+Revision ID: e2a7f4c81b93
+Revises: c5e9a1f3b7d4
+Create Date: 2026-10-18 17:58:44.201957
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7f4c81b93'
+down_revision = 'c5e9a1f3b7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists', 'shows'):
+        op.add_column(table, sa.Column(
+            'version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('shows', 'artists', 'venues'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,27 @@
+"""add updated_at to venues, artists and shows
+
+Revision ID: f7b3d95e0c21
+Revises: e2a7f4c81b93
+Create Date: 2026-10-18 18:31:09.774512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f7b3d95e0c21'
+down_revision = 'e2a7f4c81b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists', 'shows'):
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("(now() at time zone 'utc')")))
+
+
+def downgrade():
+    for table in ('shows', 'artists', 'venues'):
+        op.drop_column(table, 'updated_at')
@@ -1,15 +1,91 @@
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String
-from sqlalchemy.dialects.postgresql import ARRAY
-from datetime import datetime
-db = SQLAlchemy()
+from flask import current_app
+from sqlalchemy import String, event, func, select, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import object_session
+from sqlalchemy.dialects.postgresql import ARRAY, ExcludeConstraint
+from datetime import datetime, timedelta
+from routing import RoutingSQLAlchemy
+db = RoutingSQLAlchemy()
+
+utc_now = text("(now() at time zone 'utc')")
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+# Relationships never load with their parent. Views that render related
+# rows opt in per query with selectinload()/joinedload(), and views that
+# must not touch them use raiseload('*').
+
+
+class ShowsMixin(object):
+    # Past/upcoming show helpers shared by Venue and Artist. The counts are
+    # hybrids reading the show_counts rollup: on an instance they look up its
+    # row, on the class they compile to the same lookup as a subquery usable
+    # in filters and ORDER BY, e.g.
+    # Artist.query.filter(Artist.num_upcoming_shows > 0).
+
+    # name of the Show column referencing the including model
+    show_foreign_key = None
+    # ShowCount.kind of the including model
+    show_count_kind = None
+
+    @classmethod
+    def _show_count(cls, column):
+        return func.coalesce(select(column).where(
+            ShowCount.kind == cls.show_count_kind,
+            ShowCount.owner_id == cls.id).scalar_subquery(), 0)
+
+    def _stored_show_count(self, column):
+        # no row means no shows
+        return object_session(self).query(column).filter(
+            ShowCount.kind == self.show_count_kind,
+            ShowCount.owner_id == self.id).scalar() or 0
+
+    def _shows(self, criterion):
+        return object_session(self).query(Show).filter(
+            getattr(Show, self.show_foreign_key) == self.id, criterion)
+
+    def upcoming_shows(self):
+        return self._shows(Show.is_upcoming).order_by(Show.start_time).all()
+
+    def past_shows(self):
+        return self._shows(~Show.is_upcoming).order_by(Show.start_time).all()
+
+    @hybrid_property
+    def num_upcoming_shows(self):
+        return self._stored_show_count(ShowCount.upcoming)
+
+    @num_upcoming_shows.expression
+    def num_upcoming_shows(cls):
+        return cls._show_count(ShowCount.upcoming)
 
-class Venue(db.Model):
+    @hybrid_property
+    def num_past_shows(self):
+        return self._stored_show_count(ShowCount.past)
+
+    @num_past_shows.expression
+    def num_past_shows(cls):
+        return cls._show_count(ShowCount.past)
+
+
+class Venue(ShowsMixin, db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        # trigram indexes serve the case-insensitive substring search
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venues_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+        # region grouping and city/state filters
+        db.Index('ix_venues_city_state', 'city', 'state'),
+        # genre containment (genres @> ARRAY[...])
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+        # incremental exports (?since=)
+        db.Index('ix_venues_updated_at', 'updated_at'),
+    )
+    show_foreign_key = 'venue_id'
+    show_count_kind = 'venue'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -21,10 +97,19 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String)
     seeking_talent = db.Column(db.Boolean, default=False)
-    shows = db.relationship('Show', backref='venues',
-                            lazy=False, cascade='all, delete-orphan')
+    shows = db.relationship('Show', back_populates='venue',
+                            lazy='select', cascade='all, delete-orphan')
     genres = db.Column(ARRAY(String()))
     seeking_description = db.Column(db.Text)
+    # bumped by every ORM update; keys cached template fragments. As the
+    # version_id_col it also makes an UPDATE of a row that changed since it
+    # was loaded raise StaleDataError (optimistic locking)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    # UTC time of the last change; drives ETag/Last-Modified validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=utc_now)
+
+    __mapper_args__ = {'version_id_col': version}
 
     def __init__(self, name, city, state, address, phone, image_link, facebook_link, website, seeking_talent, genres, seeking_description):
         self.name = name
@@ -42,27 +127,26 @@ class Venue(db.Model):
     def __repr__(self):
         return f'<Venue ID: {self.id}, name: {self.name}>'
 
-    def upcoming_shows(self):
-        upcoming_shows = [
-            show for show in self.shows if show.start_time > datetime.now()]
-        return upcoming_shows
-
-    def num_upcoming_shows(self):
-        return len(self.upcoming_shows())
-
-    def past_shows(self):
-        past_shows = [
-            show for show in self.shows if show.start_time < datetime.now()]
-        return past_shows
-
-    def num_past_shows(self):
-        return len(self.past_shows())
-
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 
-class Artist(db.Model):
+class Artist(ShowsMixin, db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        # trigram indexes serve the case-insensitive substring search
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artists_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+        # region grouping and city/state filters
+        db.Index('ix_artists_city_state', 'city', 'state'),
+        # genre containment (genres @> ARRAY[...])
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+        # incremental exports (?since=)
+        db.Index('ix_artists_updated_at', 'updated_at'),
+    )
+    show_foreign_key = 'artist_id'
+    show_count_kind = 'artist'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -75,9 +159,18 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='artists',
-                            lazy=True, cascade='all, delete-orphan')
+    shows = db.relationship('Show', back_populates='artist',
+                            lazy='select', cascade='all, delete-orphan')
     created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    # bumped by every ORM update; keys cached template fragments. As the
+    # version_id_col it also makes an UPDATE of a row that changed since it
+    # was loaded raise StaleDataError (optimistic locking)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    # UTC time of the last change; drives ETag/Last-Modified validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=utc_now)
+
+    __mapper_args__ = {'version_id_col': version}
 
     def __init__(self, name, city, state, phone, image_link, facebook_link, website, seeking_venue, genres, seeking_description):
         self.name = name
@@ -94,38 +187,126 @@ class Artist(db.Model):
     def __repr__(self):
         return f'<ARTIST ID: {self.id}, name: {self.name}>'
 
-    def upcoming_shows(self):
-        upcoming_shows = [
-            show for show in self.shows if show.start_time > datetime.now()]
-        return upcoming_shows
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
-    def num_upcoming_shows(self):
-        return len(self.upcoming_shows())
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
-    def past_shows(self):
-        past_shows = [
-            show for show in self.shows if show.start_time < datetime.now()]
-        return past_shows
 
-    def num_past_shows(self):
-        return len(self.past_shows())
+# the [start_time, end_time) range a show occupies
+show_period = func.tsrange(db.column('start_time'), db.column('end_time'))
 
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+def show_end_time(start_time):
+    # end of a show entered with only its start time
+    return start_time + timedelta(minutes=current_app.config['SHOW_DEFAULT_DURATION'])
 
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        # drives keyset pagination of the /shows feed
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+        # a venue's or artist's shows, already ordered and split by time
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        # incremental exports (?since=)
+        db.Index('ix_shows_updated_at', 'updated_at'),
+        # a venue or an artist has at most one show at a time; the GiST
+        # indexes behind these (btree_gist for the id) also find the shows
+        # overlapping a time range, see scheduling.py
+        ExcludeConstraint(('venue_id', '='), (show_period, '&&'),
+                          name='ex_shows_venue_overlap', using='gist'),
+        ExcludeConstraint(('artist_id', '='), (show_period, '&&'),
+                          name='ex_shows_artist_overlap', using='gist'),
+        db.CheckConstraint('end_time > start_time', name='ck_shows_end_after_start'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
+    # shows entered without an end last SHOW_DEFAULT_DURATION minutes
+    end_time = db.Column(db.DateTime, nullable=False, default=lambda context: show_end_time(
+        context.get_current_parameters()['start_time']))
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'artists.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey(
         'venues.id'), nullable=False)
-    venue = db.relationship(
-        'Venue', backref=db.backref('showss', cascade='all, delete'))
+    venue = db.relationship('Venue', back_populates='shows', lazy='select')
+    artist = db.relationship('Artist', back_populates='shows', lazy='select')
+    # bumped by every ORM update; keys cached template fragments. As the
+    # version_id_col it also makes an UPDATE of a row that changed since it
+    # was loaded raise StaleDataError (optimistic locking)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    # UTC time of the last change; drives ETag/Last-Modified validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=utc_now)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @hybrid_property
+    def is_upcoming(self):
+        return self.start_time > datetime.now()
 
     def __repr__(self):
         return f'<Show ID: {self.id}, venue_id: {self.venue_id}, artist_id: {self.artist_id}>'
+
+
+class GenreFacet(db.Model):
+    # Maintained count of venues/artists per genre for the listing sidebars,
+    # kept current by the write handlers (see facets.py) instead of being
+    # aggregated from the genres arrays on every page view.
+    __tablename__ = 'genre_facets'
+
+    kind = db.Column(db.String(20), primary_key=True)
+    genre = db.Column(db.String, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<GenreFacet {self.kind}: {self.genre} ({self.count})>'
+
+
+class ShowCount(db.Model):
+    # Maintained upcoming/past show counts and next upcoming show of each
+    # venue and artist (see showcounts.py), so listings and search read one
+    # row per result instead of counting shows. No row means no shows.
+    __tablename__ = 'show_counts'
+    __table_args__ = (
+        # rows whose next show has started, for the roll-over job
+        db.Index('ix_show_counts_next_show_at', 'next_show_at'),
+    )
+
+    kind = db.Column(db.String(20), primary_key=True)
+    owner_id = db.Column(db.Integer, primary_key=True)
+    upcoming = db.Column(db.Integer, nullable=False, default=0)
+    past = db.Column(db.Integer, nullable=False, default=0)
+    next_show_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ShowCount {self.kind} {self.owner_id}: {self.upcoming} upcoming, {self.past} past>'
+
+
+#----------------------------------------------------------------------------#
+# Loading guard.
+#----------------------------------------------------------------------------#
+
+
+def raise_on_lazy_load(app):
+    # SQLALCHEMY_RAISE_ON_LAZY_LOAD, or when unset, on under DEBUG and TESTING
+    setting = app.config.get('SQLALCHEMY_RAISE_ON_LAZY_LOAD')
+    if setting is None:
+        return app.debug or app.testing
+    return setting
+
+
+def guard_lazy_loads(session):
+    # While raise_on_lazy_load() holds, every implicit lazy load of a
+    # relationship raises, so a view that forgot to opt in to a loading
+    # strategy fails loudly instead of issuing one query per row.
+    @event.listens_for(session, 'do_orm_execute')
+    def _reject_lazy_load(orm_execute_state):
+        if not orm_execute_state.is_select:
+            return
+        state = orm_execute_state.lazy_loaded_from
+        if state is not None and raise_on_lazy_load(current_app):
+            raise InvalidRequestError(
+                f'Unexpected lazy load from {state.class_.__name__} '
+                f'(ID: {state.identity}); add a loader option to the query')
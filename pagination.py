@@ -0,0 +1,52 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# A page is addressed by the (start_time, id) of its last row instead of an
+# OFFSET, so fetching page 10,000 costs the same index range scan as page 1.
+
+
+def encode_cursor(start_time, row_id):
+    raw = f'{start_time.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # raises ValueError on anything that was not produced by encode_cursor
+    padded = cursor + '=' * (-len(cursor) % 4)
+    start_time, row_id = base64.urlsafe_b64decode(
+        padded.encode()).decode().split('|')
+    return datetime.fromisoformat(start_time), int(row_id)
+
+
+def keyset_statement(query, time_column, id_column, cursor, per_page, descending=False):
+    # narrows a query or select() to the page after cursor, plus one extra
+    # row that tells keyset_result() whether another page exists
+    position = tuple_(time_column, id_column)
+
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        query = query.filter(position < after if descending else position > after)
+
+    if descending:
+        query = query.order_by(time_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(time_column, id_column)
+
+    return query.limit(per_page + 1)
+
+
+def keyset_result(rows, time_column, id_column, per_page):
+    # Returns (rows, next_cursor); next_cursor is None on the last page.
+    # Rows must expose the two key columns under their column names.
+    if len(rows) <= per_page:
+        return rows, None
+
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+
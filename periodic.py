@@ -0,0 +1,48 @@
+import threading
+from models import db
+
+#----------------------------------------------------------------------------#
+# Periodic tasks.
+#----------------------------------------------------------------------------#
+
+# Per-worker daemon threads for housekeeping that must not run on a request
+# thread. Each round calls the task in a fresh app context and commits; a
+# failing round is rolled back and logged, and the next one runs as usual.
+
+
+class PeriodicTask(threading.Thread):
+    # calls task() every interval seconds, starting right away
+
+    def __init__(self, app, interval, task, name):
+        super(PeriodicTask, self).__init__(name=name, daemon=True)
+        self.app = app
+        self.interval = interval
+        self.task = task
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            self.run_once()
+            if self.stopped.wait(self.interval):
+                return
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                self.task()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('periodic task %s failed', self.name)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_periodic_task(app, name, interval, task):
+    # starts the task once per worker; an interval of 0 disables it
+    if interval <= 0 or name in app.extensions:
+        return None
+    thread = app.extensions[name] = PeriodicTask(app, interval, task, name)
+    thread.start()
+    return thread
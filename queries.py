@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, select
+from facets import filter_catalogue
+from models import Artist, Show, Venue, show_period
+
+#----------------------------------------------------------------------------#
+# Read queries.
+#----------------------------------------------------------------------------#
+
+# Statements behind the read-only pages. The Flask views run them on
+# db.session and the async views in asgi.py on the asyncio engine, so both
+# serving modes issue exactly the same SQL.
+
+
+def venue_directory(filters):
+    # every venue with its region and its number of upcoming shows from the
+    # show_counts rollup, ordered by region so each city/state is one
+    # contiguous run
+    stmt = select(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.version,
+        Venue.num_upcoming_shows.label('num_upcoming_shows')
+    )
+    return filter_catalogue(stmt, Venue, filters).order_by(Venue.state, Venue.city, Venue.name)
+
+
+def artist_directory(filters):
+    return filter_catalogue(select(Artist.id, Artist.name), Artist, filters).order_by(Artist.id)
+
+
+def venue(venue_id):
+    return select(*Venue.__table__.columns).where(Venue.id == venue_id)
+
+
+def artist(artist_id):
+    return select(*Artist.__table__.columns).where(Artist.id == artist_id)
+
+
+def venue_shows(venue_id):
+    # all shows at the venue with their artist, flagged past/upcoming in SQL
+    return select(
+        Show.id,
+        Show.version,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Artist.version.label('artist_version'),
+        Show.start_time,
+        (Show.start_time > datetime.now()).label('upcoming')
+    ).join(Artist, Artist.id == Show.artist_id).where(
+        Show.venue_id == venue_id).order_by(Show.start_time)
+
+
+def artist_shows(artist_id):
+    # all shows of the artist with their venue, flagged past/upcoming in SQL
+    return select(
+        Show.id,
+        Show.version,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Venue.version.label('venue_version'),
+        Show.start_time,
+        (Show.start_time > datetime.now()).label('upcoming')
+    ).join(Venue, Venue.id == Show.venue_id).where(
+        Show.artist_id == artist_id).order_by(Show.start_time)
+
+
+def show_feed(when, city, start_date, end_date):
+    # the /shows feed before paging; raises ValueError on malformed dates
+    stmt = select(
+        Show.id,
+        Show.version,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.version.label('venue_version'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Artist.version.label('artist_version'),
+        Show.start_time
+    ).join(Venue, (Venue.id == Show.venue_id)).join(Artist, (Artist.id == Show.artist_id))
+
+    if when == 'upcoming':
+        stmt = stmt.where(Show.is_upcoming)
+    elif when == 'past':
+        stmt = stmt.where(~Show.is_upcoming)
+    if city:
+        stmt = stmt.where(Venue.city == city)
+    if start_date:
+        stmt = stmt.where(
+            Show.start_time >= datetime.strptime(start_date, '%Y-%m-%d'))
+    if end_date:
+        stmt = stmt.where(
+            Show.start_time < datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1))
+    return stmt
+
+
+def venue_schedule(venue_id, start, end):
+    # the venue's shows overlapping [start, end) in order, found through the
+    # ex_shows_venue_overlap index; a venue with none gives one row with no
+    # times and an unknown venue no rows
+    return select(
+        Venue.id,
+        Show.start_time,
+        Show.end_time
+    ).outerjoin(Show, and_(
+        Show.venue_id == Venue.id,
+        show_period.op('&&')(func.tsrange(start, end))
+    )).where(Venue.id == venue_id).order_by(Show.start_time)
@@ -0,0 +1,80 @@
+from datetime import datetime
+from dateutil.rrule import DAILY, MONTHLY, WEEKLY, rrule
+from models import db, Artist, Show, Venue
+from showcounts import record_new_shows
+
+#----------------------------------------------------------------------------#
+# Recurring shows.
+#----------------------------------------------------------------------------#
+
+# Residencies and tours are entered as one request: either a recurrence rule
+# (venue, first start time, frequency, count) or a list of (venue, start
+# time) pairs. The artist and every venue are checked with one query per
+# table, and all occurrences go in with a single multi-row INSERT in the
+# caller's transaction.
+
+FREQUENCIES = {
+    'daily': (DAILY, 1),
+    'weekly': (WEEKLY, 1),
+    'fortnightly': (WEEKLY, 2),
+    'monthly': (MONTHLY, 1),
+}
+
+
+def expand_rule(venue_id, start_time, frequency, count, max_shows):
+    # [(venue_id, start_time)] for each occurrence of the rule; the count is
+    # checked before anything is expanded
+    if frequency not in FREQUENCIES:
+        raise ValueError(f'Unknown frequency {frequency!r}.')
+    if count < 1:
+        raise ValueError('The count must be at least 1.')
+    if count > max_shows:
+        raise ValueError(f'At most {max_shows} shows can be created at once.')
+    freq, interval = FREQUENCIES[frequency]
+    return [(venue_id, start) for start in
+            rrule(freq, dtstart=start_time, interval=interval, count=count)]
+
+
+def parse_occurrences(text):
+    # [(venue_id, start_time)] from "venue_id, YYYY-MM-DD HH:MM" lines
+    occurrences = []
+    for line_num, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            venue_id, start_time = (part.strip() for part in line.split(',', 1))
+            occurrences.append((int(venue_id), datetime.fromisoformat(start_time)))
+        except ValueError:
+            raise ValueError(f'Line {line_num} is not "venue_id, YYYY-MM-DD HH:MM".')
+    return occurrences
+
+
+def insert_shows(artist_id, occurrences, max_shows):
+    # Inserts a show per (venue_id, start_time) and returns their ids.
+    # Raises ValueError, before writing anything, on unknown ids.
+    if not occurrences:
+        raise ValueError('No shows to create.')
+    if len(occurrences) > max_shows:
+        raise ValueError(f'At most {max_shows} shows can be created at once.')
+
+    if db.session.query(Artist.id).filter(Artist.id == artist_id).first() is None:
+        raise ValueError(f'Artist ID {artist_id} is invalid!')
+
+    venue_ids = {venue_id for venue_id, _ in occurrences}
+    found = {row.id for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    missing = sorted(venue_ids - found)
+    if missing:
+        raise ValueError('Venue ID ' + ', '.join(map(str, missing)) + ' is invalid!')
+
+    rows = [{'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+            for venue_id, start_time in occurrences]
+    show_ids = db.session.execute(
+        Show.__table__.insert().values(rows).returning(Show.id)).scalars().all()
+    record_new_shows((venue_id, artist_id, start_time) for venue_id, start_time in occurrences)
+    return show_ids
+
+
+def show_pages(artist_id, venue_ids):
+    # page cache keys the new shows of an artist at these venues change
+    return ['/shows?', '/venues?', f'/artists/{artist_id}?'] + [
+        f'/venues/{venue_id}?' for venue_id in venue_ids]
@@ -0,0 +1,83 @@
+import threading
+import time
+from itertools import cycle
+from flask import has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import create_engine, orm
+from sqlalchemy.sql.dml import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Reads made while handling a GET or HEAD request go to a read replica, one
+# per request picked round-robin from SQLALCHEMY_REPLICA_URIS. Everything
+# else stays on the primary: writes and flushes, reads later in a request
+# that wrote, requests outside a request context (CLI, scripts) and, for
+# REPLICA_STICKY_SECONDS after a client's last write, that client's reads,
+# so a redirect after a POST never shows a replica that has not caught up.
+# With no replicas configured every query uses the primary as before.
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        super(RoutingSession, self).__init__(db, **options)
+        self._replica = None
+        self._wrote = False
+
+    def execute(self, statement, *args, **kwargs):
+        # ORM-enabled DML reaches get_bind() without its clause
+        if isinstance(statement, UpdateBase):
+            self._wrote = True
+        return super(RoutingSession, self).execute(statement, *args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing:
+            self._wrote = True
+        elif self._use_replica():
+            if self._replica is None:
+                self._replica = self.app.extensions['replicas'].next()
+            return self._replica
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+    def _use_replica(self):
+        replicas = self.app.extensions.get('replicas')
+        if not replicas or self._wrote or not has_request_context():
+            return False
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        return session.get('_primary_until', 0) < time.time()
+
+    def commit(self):
+        super(RoutingSession, self).commit()
+        if self._wrote and self.app.extensions.get('replicas') and has_request_context():
+            session['_primary_until'] = time.time() + self.app.config['REPLICA_STICKY_SECONDS']
+
+
+class ReplicaPool(object):
+    # engines of the read replicas, handed out round-robin
+
+    def __init__(self, uris, engine_options):
+        self.engines = [create_engine(uri, **engine_options) for uri in uris]
+        self._cycle = cycle(self.engines)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.engines)
+
+    def next(self):
+        with self._lock:
+            return next(self._cycle)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def init_app(self, app):
+        super(RoutingSQLAlchemy, self).init_app(app)
+        app.extensions['replicas'] = ReplicaPool(
+            app.config.get('SQLALCHEMY_REPLICA_URIS', []),
+            app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
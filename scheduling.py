@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+#----------------------------------------------------------------------------#
+# Scheduling.
+#----------------------------------------------------------------------------#
+
+# A show occupies [start_time, end_time). The ex_shows_venue_overlap and
+# ex_shows_artist_overlap exclusion constraints keep two shows of the same
+# venue or artist from overlapping, so a conflicting insert fails inside
+# its own transaction whichever handler sent it, and their GiST indexes
+# find the shows around a time range without reading a venue's history.
+
+OVERLAP_MESSAGES = {
+    'ex_shows_venue_overlap': 'The venue already has a show at that time.',
+    'ex_shows_artist_overlap': 'The artist already has a show at that time.',
+}
+
+
+def overlap_message(error):
+    # the message for an IntegrityError raised by an overlap, else None
+    diag = getattr(error.orig, 'diag', None)
+    return OVERLAP_MESSAGES.get(getattr(diag, 'constraint_name', None))
+
+
+def free_slots(shows, start, end, min_length=timedelta(0)):
+    # [(start, end)] gaps of at least min_length in [start, end) between
+    # shows, given as rows with start_time/end_time ordered by start_time
+    slots = []
+    free_from = start
+    for show in shows:
+        if show.start_time is None:
+            continue
+        if show.start_time > free_from and show.start_time - free_from >= min_length:
+            slots.append((free_from, show.start_time))
+        free_from = max(free_from, show.end_time)
+    if end > free_from and end - free_from >= min_length:
+        slots.append((free_from, end))
+    return slots
@@ -0,0 +1,72 @@
+import math
+from flask import current_app
+from sqlalchemy import case, func, or_, select, text
+from forms import GENRE_CHOICES
+from models import db
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Venue and artist search matches the term anywhere in the name or city
+# (case-insensitive) or exactly against a genre. The ILIKE patterns are
+# served by pg_trgm GIN indexes and genre matches by the GIN index on the
+# genres array, so neither degrades into a sequential scan. Results are
+# ranked name matches first, then by trigram similarity to the name. The
+# app checks for pg_trgm once at startup (app.extensions['pg_trgm']); a
+# database without it ranks by name alone.
+
+GENRES = {genre.lower(): genre for genre, _ in GENRE_CHOICES}
+
+TRIGRAM_CHECK = text("SELECT EXISTS (SELECT FROM pg_extension WHERE extname = 'pg_trgm')")
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_statements(model, term, page=1, per_page=20, similarity=True):
+    # (count, page of rows) statements of a search; see search_results()
+    term = term.strip()
+    pattern = '%' + escape_like(term) + '%'
+    name_match = model.name.ilike(pattern, escape='\\')
+
+    criteria = [name_match, model.city.ilike(pattern, escape='\\')]
+    genre = GENRES.get(term.lower())
+    if genre:
+        criteria.append(model.genres.contains([genre]))
+    matches = or_(*criteria)
+
+    # the total comes from a COUNT over the index, never from fetched rows
+    count = select(func.count(model.id)).where(matches)
+
+    ranking = [case((name_match, 0), else_=1)]
+    if similarity:
+        ranking.append(func.similarity(model.name, term).desc())
+    data = select(
+        model.id,
+        model.name,
+        model.num_upcoming_shows.label('num_upcoming_shows')
+    ).where(matches).order_by(
+        *ranking,
+        model.name,
+        model.id
+    ).offset((page - 1) * per_page).limit(per_page)
+
+    return count, data
+
+
+def search_results(count, data, page, per_page):
+    return {
+        "count": count,
+        "data": [row._asdict() for row in data],
+        "page": page,
+        "pages": max(1, math.ceil(count / per_page))
+    }
+
+
+def search(model, term, page=1, per_page=20):
+    count, data = search_statements(model, term, page, per_page,
+                                    current_app.extensions.get('pg_trgm', False))
+    return search_results(db.session.execute(count).scalar(),
+                          db.session.execute(data).all(), page, per_page)
@@ -0,0 +1,106 @@
+from datetime import datetime
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from models import db, Show, ShowCount
+from periodic import start_periodic_task
+
+#----------------------------------------------------------------------------#
+# Show counts.
+#----------------------------------------------------------------------------#
+
+# Upcoming/past counts and the next upcoming show of every venue and artist
+# live in the show_counts rollup. Writes adjust it in the transaction that
+# adds or removes shows. Time also moves shows from upcoming to past: a
+# row's counts are stale once its next_show_at has passed, so a background
+# thread in each worker periodically recounts just those rows. The thread
+# takes a transaction-level advisory lock first, so only one worker at a
+# time does the work and the others skip that round.
+
+OWNERS = {'venue': Show.venue_id, 'artist': Show.artist_id}
+
+# key of the advisory lock held while rolling counts over
+ROLL_LOCK_KEY = 0x5c0a7
+
+COLUMNS = ['kind', 'owner_id', 'upcoming', 'past', 'next_show_at']
+
+
+def record_new_shows(shows, now=None):
+    # adds shows, given as (venue_id, artist_id, start_time), to the counts
+    now = now or datetime.now()
+    rows = {}
+    for venue_id, artist_id, start_time in shows:
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            row = rows.setdefault(key, dict(zip(COLUMNS, key + (0, 0, None))))
+            if start_time > now:
+                row['upcoming'] += 1
+                if row['next_show_at'] is None or start_time < row['next_show_at']:
+                    row['next_show_at'] = start_time
+            else:
+                row['past'] += 1
+    if not rows:
+        return
+
+    # a fixed row order keeps concurrent writers from deadlocking
+    stmt = insert(ShowCount).values([rows[key] for key in sorted(rows)])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[ShowCount.kind, ShowCount.owner_id],
+        set_={
+            'upcoming': ShowCount.upcoming + stmt.excluded.upcoming,
+            'past': ShowCount.past + stmt.excluded.past,
+            # least() ignores NULLs
+            'next_show_at': func.least(ShowCount.next_show_at, stmt.excluded.next_show_at)
+        }))
+
+
+def _counts_select(kind, now):
+    owner = OWNERS[kind]
+    upcoming = Show.start_time > now
+    return select(
+        literal(kind),
+        owner,
+        func.count(Show.id).filter(upcoming),
+        func.count(Show.id).filter(~upcoming),
+        func.min(Show.start_time).filter(upcoming)
+    ).group_by(owner)
+
+
+def refresh_show_counts(kind, owner_ids, now=None):
+    # recounts the given venues or artists from their shows, e.g. after
+    # shows were deleted; owners left without shows lose their row
+    owner_ids = sorted(set(owner_ids))
+    if not owner_ids:
+        return
+    now = now or datetime.now()
+    db.session.execute(ShowCount.__table__.delete().where(
+        ShowCount.kind == kind, ShowCount.owner_id.in_(owner_ids)))
+    db.session.execute(ShowCount.__table__.insert().from_select(
+        COLUMNS, _counts_select(kind, now).where(OWNERS[kind].in_(owner_ids))))
+
+
+def roll_show_counts(now=None):
+    # Recounts the rows whose next show has started. Returns how many rows
+    # were due, or None if another worker is already rolling.
+    now = now or datetime.now()
+    if not db.session.execute(select(func.pg_try_advisory_xact_lock(ROLL_LOCK_KEY))).scalar():
+        return None
+
+    due = db.session.execute(select(ShowCount.kind, ShowCount.owner_id).where(
+        ShowCount.next_show_at <= now)).all()
+    for kind in OWNERS:
+        refresh_show_counts(kind, [owner_id for row_kind, owner_id in due if row_kind == kind], now)
+    return len(due)
+
+
+def rebuild_show_counts():
+    # recomputes every row from scratch, e.g. after bulk loads
+    now = datetime.now()
+    db.session.query(ShowCount).delete()
+    for kind in OWNERS:
+        db.session.execute(ShowCount.__table__.insert().from_select(
+            COLUMNS, _counts_select(kind, now)))
+
+
+def start_show_count_roller(app):
+    # starts this worker's roller once; SHOW_COUNTS_ROLL_INTERVAL = 0 disables it
+    start_periodic_task(app, 'show_count_roller', app.config['SHOW_COUNTS_ROLL_INTERVAL'],
+                        roll_show_counts)
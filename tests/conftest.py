@@ -0,0 +1,117 @@
+import os
+import re
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.exc import OperationalError
+
+os.environ.setdefault('LOG_FILE', os.devnull)
+
+from app import app as flask_app  # noqa: E402
+from models import db, Artist, Show, Venue  # noqa: E402
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+# The suite runs against a throwaway Postgres database, TEST_DATABASE_URI,
+# whose tables are dropped and recreated for every test.
+
+TEST_DATABASE_URI = os.environ.get(
+    'TEST_DATABASE_URI', 'postgresql://niffy@localhost:5432/fyyur_test')
+
+QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+# contrib extensions the test server provides, see _create_schema()
+available_extensions = set()
+
+
+def _extension_needed(item):
+    # the contrib extension an index or constraint needs, if any
+    if isinstance(item, ExcludeConstraint):
+        return 'btree_gist'
+    if item.name and item.name.endswith('_trgm'):
+        return 'pg_trgm'
+    return None
+
+
+def _create_schema():
+    # Objects needing an extension the server lacks are left out of the
+    # test schema; tests relying on them call require_extension().
+    available = {name for name, in db.session.execute(text(
+        'SELECT name FROM pg_available_extensions'))}
+    available_extensions.update(available)
+    for extension in ('pg_trgm', 'btree_gist'):
+        if extension in available:
+            db.session.execute(text(f'CREATE EXTENSION IF NOT EXISTS {extension}'))
+    db.session.commit()
+
+    for table in db.metadata.tables.values():
+        for items in (table.indexes, table.constraints):
+            for item in list(items):
+                if _extension_needed(item) not in (None, *available):
+                    items.discard(item)
+    db.drop_all()
+    db.create_all()
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=TEST_DATABASE_URI,
+        SQLALCHEMY_REPLICA_URIS=[],
+        WTF_CSRF_ENABLED=False,
+        SHOW_COUNTS_ROLL_INTERVAL=0,
+        TYPEAHEAD_REFRESH_INTERVAL=0)
+    with flask_app.app_context():
+        try:
+            _create_schema()
+        except OperationalError as e:
+            pytest.skip(f'test database unavailable: {e.orig}')
+        flask_app.extensions['page_cache'].clear()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def require_extension(name):
+    # skips a test that needs an extension the test server lacks
+    if name not in available_extensions:
+        pytest.skip(f'{name} is not available on the test database server')
+
+
+def query_count(response):
+    # statements the request ran, from its Server-Timing header
+    return int(QUERIES.search(response.headers['Server-Timing']).group(1))
+
+
+def add_venue(name, city='San Francisco', state='CA', genres=('Jazz',)):
+    venue = Venue(name=name, city=city, state=state, address='1 Main St', phone='555-0100',
+                  image_link='', facebook_link='', website='', seeking_talent=False,
+                  genres=list(genres), seeking_description='')
+    db.session.add(venue)
+    db.session.flush()
+    return venue
+
+
+def add_artist(name, genres=('Jazz',)):
+    artist = Artist(name=name, city='San Francisco', state='CA', phone='555-0100',
+                    image_link='', facebook_link='', website='', seeking_venue=False,
+                    genres=list(genres), seeking_description='')
+    db.session.add(artist)
+    db.session.flush()
+    return artist
+
+
+def add_show(venue, artist, days):
+    show = Show(venue_id=venue.id, artist_id=artist.id,
+                start_time=datetime.now() + timedelta(days=days))
+    db.session.add(show)
+    db.session.flush()
+    return show
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import pytest
+from sqlalchemy import event
+from models import db
+from conftest import add_artist, add_venue
+
+
+@pytest.fixture
+def cursors(app):
+    # names of the cursors statements run on; server-side cursors are named
+    names = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        names.append(cursor.name)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield names
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_venue_export_streams_ndjson(app, client, cursors, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORT_CHUNK_SIZE', 2)
+    for i in range(5):
+        add_venue(f'Venue {i}', genres=['Jazz', 'Folk'])
+    db.session.commit()
+
+    response = client.get('/api/v1/venues/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=venues.ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['name'] for row in rows] == [f'Venue {i}' for i in range(5)]
+    assert rows[0]['genres'] == ['Jazz', 'Folk']
+    assert any(cursors)
+
+
+def test_artist_export_streams_csv(app, client, cursors, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORT_CHUNK_SIZE', 2)
+    for i in range(5):
+        add_artist(f'Artist {i}', genres=['Jazz', 'Folk'])
+    db.session.commit()
+
+    response = client.get('/api/v1/artists/export?format=csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    header, *rows = csv.reader(io.StringIO(response.get_data(as_text=True)))
+    assert header[:2] == ['id', 'name']
+    assert [row[1] for row in rows] == [f'Artist {i}' for i in range(5)]
+    assert rows[0][header.index('genres')] == 'Jazz;Folk'
+    assert any(cursors)
+
+
+def test_empty_exports_are_valid(client):
+    add_venue('The Musical Hop')
+    db.session.commit()
+
+    ndjson = client.get('/api/v1/venues/export?since=2999-01-01')
+    assert ndjson.status_code == 200
+    assert ndjson.data == b''
+
+    empty_csv = client.get('/api/v1/artists/export?format=csv')
+    assert empty_csv.status_code == 200
+    assert list(csv.reader(io.StringIO(empty_csv.get_data(as_text=True))))[0][:2] == ['id', 'name']
+    assert len(empty_csv.get_data(as_text=True).splitlines()) == 1
+
+
+def test_export_rejects_bad_arguments(client):
+    assert client.get('/api/v1/venues/export?format=xml').status_code == 400
+    assert client.get('/api/v1/venues/export?since=yesterday').json == {
+        'error': 'since must be an ISO 8601 date or time'}
+    assert client.get('/api/v1/users/export').status_code == 404
@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+from itertools import cycle
+import pytest
+from sqlalchemy.pool import NullPool
+from instrumentation import QueryBudgetExceeded
+from models import db
+from conftest import TEST_DATABASE_URI, add_artist, add_show, add_venue, query_count
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('asyncpg')
+asgi = pytest.importorskip('asgi')
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from prometheus_client import REGISTRY  # noqa: E402
+
+
+@pytest.fixture
+def fetch(app, monkeypatch):
+    # fetch(path, **kwargs) -> response of the ASGI application; each call
+    # runs in its own event loop, so connections are not pooled across them
+    engine = create_async_engine(TEST_DATABASE_URI.replace('postgresql://', 'postgresql+asyncpg://', 1),
+                                 poolclass=NullPool)
+    monkeypatch.setattr(asgi, 'engines', [engine])
+    monkeypatch.setattr(asgi, '_next_engine', cycle([engine]))
+
+    def fetch(path, **kwargs):
+        async def get():
+            transport = httpx.ASGITransport(app=asgi.application)
+            async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+                return await client.get(path, **kwargs)
+        # outside the test's app context, as under a server, so every request
+        # gets (and tears down) its own
+        return contextvars.Context().run(asyncio.run, get())
+
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    add_show(venue, artist, days=1)
+    db.session.commit()
+    yield fetch
+    asyncio.run(engine.dispose())
+
+
+def _requests(endpoint, status):
+    return REGISTRY.get_sample_value('fyyur_requests_total', {
+        'endpoint': endpoint, 'method': 'GET', 'status': str(status)}) or 0
+
+
+@pytest.mark.parametrize('path, text', [
+    ('/venues', 'The Musical Hop'),
+    ('/artists', 'Guns N Petals'),
+    ('/venues/1', 'Guns N Petals'),
+    ('/artists/1', 'The Musical Hop'),
+    ('/shows', 'Guns N Petals'),
+    ('/venues/search?search_term=hop', 'The Musical Hop'),
+    ('/artists/search?search_term=petals', 'Guns N Petals'),
+    ('/api/v1/venues/export', 'The Musical Hop'),
+    ('/api/v1/artists/export?format=csv', 'Guns N Petals')])
+def test_reads_run_in_the_flask_request_cycle(app, client, fetch, path, text):
+    response = fetch(path)
+    assert response.status_code == 200
+    assert text in response.text
+    # instrumentation and logging hooks ran, and saw the async queries
+    assert response.headers['X-Request-ID']
+    app.extensions['page_cache'].clear()
+    assert query_count(response) == query_count(client.get(path))
+
+
+def test_read_over_budget_fails(app, fetch, monkeypatch):
+    monkeypatch.setattr(app.view_functions['venues'], 'query_budget', 0)
+    with pytest.raises(QueryBudgetExceeded):
+        fetch('/venues')
+
+
+def test_reads_are_counted_once_in_metrics(fetch):
+    before = _requests('venues', 200), _requests('show_venue', 302)
+    assert fetch('/venues').status_code == 200
+    # a missing venue is handed to Flask, which redirects
+    assert fetch('/venues/99').status_code == 302
+    assert (_requests('venues', 200), _requests('show_venue', 302)) == (before[0] + 1, before[1] + 1)
+
+
+def test_revalidation_is_answered_with_304(fetch):
+    etag = fetch('/venues/1').headers['ETag']
+    response = fetch('/venues/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['X-Request-ID']
@@ -0,0 +1,66 @@
+import re
+from datetime import datetime, timedelta
+from conditional import validators_from_row, venue_validators_statement
+from models import db, Artist, Venue
+from showcounts import record_new_shows
+from conftest import add_artist, add_show, add_venue
+
+
+def test_detail_page_is_not_served_stale_after_an_uninvalidated_change(app, client):
+    venue = add_venue('The Musical Hop')
+    add_show(venue, add_artist('Guns N Petals'), days=1)
+    db.session.commit()
+
+    first = client.get(f'/venues/{venue.id}')
+    assert b'The Musical Hop' in first.data
+
+    # another worker's edit: this worker's page cache is not invalidated
+    Venue.query.get(venue.id).name = 'The Dueling Pianos Bar'
+    db.session.commit()
+
+    second = client.get(f'/venues/{venue.id}', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert b'The Dueling Pianos Bar' in second.data
+
+    third = client.get(f'/venues/{venue.id}', headers={'If-None-Match': second.headers['ETag']})
+    assert third.status_code == 304
+
+
+def _etag(client, venue_id):
+    response = client.get(f'/venues/{venue_id}')
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_validators_change_with_shows_and_counterparts(app, client):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    db.session.commit()
+    before = _etag(client, venue.id)
+    assert client.get(f'/venues/{venue.id}', headers={'If-None-Match': before}).status_code == 304
+
+    show = add_show(venue, artist, days=1)
+    record_new_shows([(show.venue_id, show.artist_id, show.start_time)])
+    db.session.commit()
+    with_show = _etag(client, venue.id)
+    assert with_show != before
+
+    Artist.query.get(artist.id).name = 'Matt Quevedo'
+    db.session.commit()
+    response = client.get(f'/venues/{venue.id}', headers={'If-None-Match': with_show})
+    assert response.status_code == 200
+    assert b'Matt Quevedo' in response.data
+
+
+def test_validators_change_when_the_next_show_starts():
+    row = (1, datetime(2026, 1, 1), 1, 0, datetime.now() + timedelta(hours=1), None)
+    started = row[:4] + (datetime.now() - timedelta(hours=1),) + row[5:]
+    upcoming_etag, upcoming_modified = validators_from_row(row)
+    started_etag, started_modified = validators_from_row(started)
+    assert upcoming_etag != started_etag
+    assert started_modified > upcoming_modified
+
+
+def test_validators_do_not_scan_shows():
+    assert not re.search(r'\bshows\b', str(venue_validators_statement(1)))
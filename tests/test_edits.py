@@ -0,0 +1,40 @@
+import pytest
+from models import db, Artist, Venue
+from conftest import add_artist, add_venue
+
+VENUE_FORM = {'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St', 'phone': '555-0100',
+              'genres': ['Jazz'], 'image_link': '', 'facebook_link': '', 'website_link': '',
+              'seeking_description': ''}
+ARTIST_FORM = {'city': 'San Francisco', 'state': 'CA', 'phone': '555-0100', 'genres': ['Jazz'],
+               'image_link': '', 'facebook_link': '', 'website_link': '', 'seeking_description': ''}
+
+
+@pytest.mark.parametrize('kind, model, add, form', [
+    ('venue', Venue, add_venue, VENUE_FORM),
+    ('artist', Artist, add_artist, ARTIST_FORM)])
+def test_edit_based_on_an_old_version_is_rejected(client, kind, model, add, form):
+    entity_id = add('Original').id
+    db.session.commit()
+    assert b'name="version" value="1"' in client.get(f'/{kind}s/{entity_id}/edit').data
+
+    # someone else saves first, from the same version
+    client.post(f'/{kind}s/{entity_id}/edit', data=dict(form, name='First', version=1))
+    response = client.post(f'/{kind}s/{entity_id}/edit', data=dict(form, name='Second', version=1),
+                           follow_redirects=True)
+
+    assert b'was modified by someone else' in response.data
+    assert b'value="First"' in response.data
+    db.session.expire_all()
+    assert (model.query.get(entity_id).name, model.query.get(entity_id).version) == ('First', 2)
+
+
+def test_edit_of_the_current_version_is_saved(client):
+    venue_id = add_venue('Original').id
+    db.session.commit()
+
+    for version, name in ((1, 'First'), (2, 'Second')):
+        response = client.post(f'/venues/{venue_id}/edit',
+                               data=dict(VENUE_FORM, name=name, version=version))
+        assert response.headers['Location'].endswith(f'/venues/{venue_id}')
+    db.session.expire_all()
+    assert Venue.query.get(venue_id).name == 'Second'
@@ -0,0 +1,36 @@
+from models import db, GenreFacet
+from conftest import add_artist, add_venue
+
+VENUE_FORM = {'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St', 'phone': '555-0100',
+              'image_link': '', 'facebook_link': '', 'website_link': '', 'seeking_description': ''}
+ARTIST_FORM = {'city': 'San Francisco', 'state': 'CA', 'phone': '555-0100', 'image_link': '',
+               'facebook_link': '', 'website_link': '', 'seeking_description': ''}
+
+
+def _facets():
+    return {(facet.kind, facet.genre): facet.count
+            for facet in GenreFacet.query.filter(GenreFacet.count > 0)}
+
+
+def test_writes_keep_facet_counts_current(client):
+    client.post('/venues/create', data=dict(VENUE_FORM, name='The Musical Hop', genres=['Jazz', 'Folk']))
+    client.post('/venues/create', data=dict(VENUE_FORM, name='Park Square', genres=['Jazz']))
+    client.post('/artists/create', data=dict(ARTIST_FORM, name='Guns N Petals', genres=['Folk']))
+    assert _facets() == {('venue', 'Jazz'): 2, ('venue', 'Folk'): 1, ('artist', 'Folk'): 1}
+
+    client.post('/artists/1/edit', data=dict(ARTIST_FORM, name='Guns N Petals', genres=['Blues', 'Funk']))
+    assert client.delete('/venues/1').json == {'success': True}
+    assert _facets() == {('venue', 'Jazz'): 1, ('artist', 'Blues'): 1, ('artist', 'Funk'): 1}
+
+
+def test_rebuild_facets_repairs_drift(app):
+    add_venue('The Musical Hop', genres=['Jazz', 'Folk'])
+    add_venue('Park Square', genres=['Jazz'])
+    add_artist('Guns N Petals', genres=['Folk'])
+    db.session.add(GenreFacet(kind='venue', genre='Jazz', count=7))
+    db.session.add(GenreFacet(kind='artist', genre='Blues', count=1))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['rebuild-facets'])
+    assert result.exit_code == 0, result.output
+    assert _facets() == {('venue', 'Jazz'): 2, ('venue', 'Folk'): 1, ('artist', 'Folk'): 1}
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from importer import import_rows
+from models import Show, Venue
+from conftest import add_artist, add_venue
+
+
+def test_show_rows_without_start_time_are_rejected(app):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    start_time = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M')
+    rows = [
+        (2, {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': start_time}),
+        (3, {'venue_id': venue.id, 'artist_id': artist.id}),
+        (4, {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': ' '}),
+    ]
+    errors = []
+    assert import_rows('shows', rows, on_error=lambda *error: errors.append(error)) == (1, 2)
+    assert [line_num for line_num, _ in errors] == [3, 4]
+    assert all('start_time' in message for _, message in errors)
+    assert Show.query.count() == 1
+
+
+def test_failed_chunk_stops_the_import_and_can_be_resumed(app, tmp_path):
+    path = tmp_path / 'venues.csv'
+    rows = [f'Venue {i},San Francisco,CA,{i} Main St,555-0100,Jazz,https://www.facebook.com/venue{i}'
+            for i in range(5)]
+    # longer than the address column: passes the form, fails the insert
+    rows[2] = rows[2].replace('2 Main St', 'x' * 200)
+    path.write_text('name,city,state,address,phone,genres,facebook_link\n' + '\n'.join(rows) + '\n')
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['import', 'venues', str(path), '--chunk-size', '2'])
+    assert result.exit_code == 1, result.output
+    assert f'{path}:4: value too long' in result.output
+    assert '--start-line 4' in result.output
+    assert [venue.name for venue in Venue.query.order_by(Venue.id)] == ['Venue 0', 'Venue 1']
+
+    path.write_text(path.read_text().replace('x' * 200, '2 Main St'))
+    result = runner.invoke(args=['import', 'venues', str(path), '--chunk-size', '2', '--start-line', '4'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 venues, rejected 0 rows.' in result.output
+    assert Venue.query.count() == 5
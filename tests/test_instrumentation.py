@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from instrumentation import QueryBudgetExceeded
+from models import db
+from conftest import add_venue, query_count
+
+
+def test_views_within_budget_pass(client):
+    add_venue('The Musical Hop')
+    db.session.commit()
+    response = client.get('/venues')
+    assert response.status_code == 200
+    assert query_count(response) <= client.application.view_functions['venues'].query_budget
+
+
+def test_view_over_budget_fails(app, client, monkeypatch):
+    add_venue('The Musical Hop')
+    db.session.commit()
+    monkeypatch.setattr(app.view_functions['venues'], 'query_budget', 0)
+    with pytest.raises(QueryBudgetExceeded, match='over its budget of 0'):
+        client.get('/venues')
+
+
+def test_failed_statement_is_not_left_on_the_connection(app):
+    with db.engine.connect() as conn:
+        with pytest.raises(ProgrammingError):
+            conn.execute(text('SELECT * FROM no_such_table'))
+        assert conn.info['query_started'] == []
@@ -0,0 +1,58 @@
+import json
+from flask import Flask
+from logs import init_logging, stop_logging
+
+
+def _logging_app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(LOG_FILE=str(tmp_path / 'app.log'), LOG_LEVEL='INFO')
+    init_logging(app)
+
+    @app.route('/fail')
+    def fail():
+        try:
+            raise ValueError('bad input')
+        except ValueError:
+            app.logger.exception('could not handle %s', 'the request')
+        return 'handled'
+
+    return app
+
+
+def _entries(tmp_path):
+    with open(tmp_path / 'app.log') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_json_lines(tmp_path):
+    app = _logging_app(tmp_path)
+    response = app.test_client().get('/fail', headers={'X-Request-ID': 'abc123'})
+    assert response.headers['X-Request-ID'] == 'abc123'
+    app.logger.debug('below LOG_LEVEL')
+    app.logger.info('outside a request', extra={'rows': 3})
+    stop_logging(app)  # writes out what is still queued
+
+    request_entry, plain_entry = _entries(tmp_path)
+    assert request_entry['level'] == 'ERROR'
+    assert request_entry['message'] == 'could not handle the request'
+    assert request_entry['request_id'] == 'abc123'
+    assert request_entry['method'] == 'GET'
+    assert request_entry['path'] == '/fail'
+    assert request_entry['route'] == 'fail'
+    assert request_entry['exception']['type'] == 'ValueError'
+    assert request_entry['exception']['message'] == 'bad input'
+    assert 'raise ValueError' in request_entry['exception']['traceback']
+
+    assert plain_entry['message'] == 'outside a request'
+    assert plain_entry['rows'] == 3
+    assert 'request_id' not in plain_entry
+
+
+def test_stop_logging_stops_the_listener(tmp_path):
+    app = _logging_app(tmp_path)
+    listener = app.extensions['log_listener']
+    stop_logging(app)
+    assert listener._thread is None
+    assert 'log_listener' not in app.extensions
+    assert not app.logger.handlers
+    stop_logging(app)  # again, as at exit
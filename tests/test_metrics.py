@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from prometheus_client import REGISTRY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_is_counted_and_timed(client):
+    requests = _sample('fyyur_requests_total', endpoint='venues', method='GET', status='200')
+    timed = _sample('fyyur_request_duration_seconds_count', endpoint='venues', method='GET')
+    db_timed = _sample('fyyur_request_db_duration_seconds_count', endpoint='venues')
+    rendered = _sample('fyyur_template_render_duration_seconds_count',
+                       template='pages/venues.html')
+    in_flight = _sample('fyyur_requests_in_flight')
+
+    assert client.get('/venues').status_code == 200
+
+    assert _sample('fyyur_requests_total',
+                   endpoint='venues', method='GET', status='200') == requests + 1
+    assert _sample('fyyur_request_duration_seconds_count',
+                   endpoint='venues', method='GET') == timed + 1
+    assert _sample('fyyur_request_db_duration_seconds_count', endpoint='venues') == db_timed + 1
+    assert _sample('fyyur_template_render_duration_seconds_count',
+                   template='pages/venues.html') == rendered + 1
+    assert _sample('fyyur_requests_in_flight') == in_flight
+
+
+def test_unmatched_urls_share_a_label(client):
+    before = _sample('fyyur_requests_total', endpoint='unmatched', method='GET', status='404')
+    client.get('/no/such/page')
+    client.get('/another/missing/page')
+    assert _sample('fyyur_requests_total',
+                   endpoint='unmatched', method='GET', status='404') == before + 2
+
+
+def test_scrape_sums_worker_processes(tmp_path):
+    # each worker is a separate process writing to the shared directory
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), LOG_FILE=os.devnull)
+    worker = "from app import app; assert app.test_client().get('/').status_code == 200"
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], cwd=ROOT, env=env, check=True)
+
+    scrape = "from metrics import exposition; print(exposition()[0].decode())"
+    body = subprocess.run([sys.executable, '-c', scrape], cwd=ROOT, env=env, check=True,
+                          capture_output=True, text=True).stdout
+    assert 'fyyur_requests_total{endpoint="index",method="GET",status="200"} 2.0' in body
+    assert 'fyyur_request_duration_seconds_count{endpoint="index",method="GET"} 2.0' in body
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from models import db, Venue
+from showcounts import record_new_shows
+from conftest import add_artist, add_show, add_venue
+
+
+@pytest.fixture
+def venue_with_show(app):
+    venue = add_venue('The Musical Hop')
+    add_show(venue, add_artist('Guns N Petals'), days=1)
+    db.session.commit()
+    return venue.id
+
+
+def test_implicit_lazy_load_in_a_view_fails(app, client, venue_with_show, monkeypatch):
+    def lazy_view(venue_id):
+        return str(len(Venue.query.get(venue_id).shows))
+
+    monkeypatch.setitem(app.view_functions, 'show_venue', lazy_view)
+    with pytest.raises(InvalidRequestError, match='Unexpected lazy load from Venue'):
+        client.get(f'/venues/{venue_with_show}')
+
+
+def test_detail_pages_load_without_lazy_loads(client, venue_with_show):
+    assert client.get(f'/venues/{venue_with_show}').status_code == 200
+    assert client.get('/artists/1').status_code == 200
+
+
+def test_lazy_load_guard_can_be_switched_off(app, venue_with_show, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_RAISE_ON_LAZY_LOAD', False)
+    assert len(Venue.query.get(venue_with_show).shows) == 1
+
+
+def test_show_counts_agree_on_instance_and_class(app):
+    venue = add_venue('The Dueling Pianos Bar')
+    artist = add_artist('Matt Quevedo')
+    shows = [add_show(venue, artist, days) for days in (-3, 2, 5)]
+    record_new_shows([(show.venue_id, show.artist_id, show.start_time) for show in shows])
+    db.session.commit()
+
+    assert (venue.num_upcoming_shows, venue.num_past_shows) == (2, 1)
+    assert db.session.query(Venue.num_upcoming_shows, Venue.num_past_shows).filter(
+        Venue.id == venue.id).one() == (2, 1)
+    assert add_venue('The Empty Room').num_upcoming_shows == 0
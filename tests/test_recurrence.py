@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import pytest
+import recurrence
+from models import db, Show
+from conftest import add_artist, add_venue
+
+
+@pytest.mark.parametrize('count', [0, -1, 501, 10 ** 8])
+def test_api_rejects_counts_out_of_range_before_expanding(app, client, monkeypatch, count):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    db.session.commit()
+
+    def rrule(*args, **kwargs):
+        raise AssertionError('rule expanded')
+    monkeypatch.setattr(recurrence, 'rrule', rrule)
+
+    response = client.post('/api/v1/shows', json={
+        'artist_id': artist.id, 'venue_id': venue.id, 'count': count,
+        'start_time': (datetime.now() + timedelta(days=1)).isoformat()})
+    assert response.status_code == 400
+    assert Show.query.count() == 0
+
+
+def test_api_expands_a_rule_within_the_limit(app, client):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    db.session.commit()
+
+    response = client.post('/api/v1/shows', json={
+        'artist_id': artist.id, 'venue_id': venue.id, 'count': 4, 'frequency': 'weekly',
+        'start_time': (datetime.now() + timedelta(days=1)).isoformat()})
+    assert response.status_code == 201
+    assert len(response.json['ids']) == 4
+
+
+def test_recurring_form_reports_malformed_fields(app, client, monkeypatch):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    db.session.commit()
+
+    def rrule(*args, **kwargs):
+        raise AssertionError('rule expanded')
+    monkeypatch.setattr(recurrence, 'rrule', rrule)
+
+    response = client.post('/shows/create/recurring', data={
+        'artist_id': artist.id, 'venue_id': venue.id, 'frequency': 'weekly',
+        'start_time': 'next tuesday', 'count': 'four'})
+    assert response.status_code == 400
+    assert b'start_time: Not a valid datetime value.' in response.data
+    assert b'count: Not a valid integer value.' in response.data
+    assert b'value="next tuesday"' in response.data
+    assert Show.query.count() == 0
+
+
+def test_recurring_form_lists_the_shows(app, client):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    db.session.commit()
+
+    response = client.post('/shows/create/recurring', data={
+        'artist_id': artist.id, 'venue_id': venue.id, 'frequency': 'weekly', 'count': 3,
+        'start_time': (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')})
+    assert response.status_code == 302
+    assert Show.query.count() == 3
@@ -0,0 +1,109 @@
+import time
+import pytest
+from sqlalchemy import event
+from models import db, Venue
+from routing import ReplicaPool
+from conftest import TEST_DATABASE_URI, add_venue
+
+VENUE_FORM = {'name': 'Park Square', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+              'phone': '555-0100', 'genres': ['Jazz'], 'image_link': '', 'facebook_link': '',
+              'website_link': '', 'seeking_description': ''}
+
+
+def _track(engines):
+    # [name of the engine] of every statement run, in order
+    used = []
+    listeners = []
+    for name, engine in engines.items():
+        def record(*args, name=name):
+            used.append(name)
+        event.listen(engine, 'before_cursor_execute', record)
+        listeners.append((engine, record))
+    return used, listeners
+
+
+def _request(client, method, url, **kwargs):
+    # Served requests end with their app context, which removes the
+    # session; the test's own app context outlives them, so do it here.
+    response = client.open(url, method=method, **kwargs)
+    db.session.remove()
+    return response
+
+
+@pytest.fixture
+def engines_used(app, monkeypatch):
+    # two "replicas", both the test database, so routing is observable
+    replicas = ReplicaPool([TEST_DATABASE_URI] * 2, {})
+    monkeypatch.setitem(app.extensions, 'replicas', replicas)
+    add_venue('The Musical Hop')
+    db.session.commit()
+    db.session.remove()
+
+    used, listeners = _track({'primary': db.engine, 'replica 0': replicas.engines[0],
+                              'replica 1': replicas.engines[1]})
+    yield used
+    for engine, record in listeners:
+        event.remove(engine, 'before_cursor_execute', record)
+    for engine in replicas.engines:
+        engine.dispose()
+
+
+def test_get_requests_read_from_a_replica_each(client, engines_used):
+    _request(client, 'GET', '/venues/search?search_term=hop')
+    first = set(engines_used)
+    engines_used.clear()
+    _request(client, 'GET', '/venues/search?search_term=hop')
+
+    assert first in ({'replica 0'}, {'replica 1'})
+    assert set(engines_used) in ({'replica 0'}, {'replica 1'}) and set(engines_used) != first
+
+
+def test_a_flush_pins_the_session_to_the_primary(app, engines_used):
+    with app.test_request_context('/venues', method='GET'):
+        Venue.query.all()
+        assert set(engines_used) <= {'replica 0', 'replica 1'}
+
+        engines_used.clear()
+        db.session.add(Venue(name='Park Square', city='Austin', state='TX', address='', phone='',
+                             image_link='', facebook_link='', website='', seeking_talent=False,
+                             genres=[], seeking_description=''))
+        db.session.flush()
+        Venue.query.all()
+        db.session.rollback()
+        assert set(engines_used) == {'primary'}
+        db.session.remove()
+
+
+def test_reads_stay_on_the_primary_after_a_write(client, engines_used):
+    _request(client, 'POST', '/venues/create', data=VENUE_FORM)
+    with client.session_transaction() as session:
+        assert session['_primary_until'] > time.time()
+
+    engines_used.clear()
+    _request(client, 'GET', '/venues/search?search_term=park')
+    assert set(engines_used) == {'primary'}
+
+    with client.session_transaction() as session:
+        session['_primary_until'] = time.time() - 1
+    engines_used.clear()
+    _request(client, 'GET', '/venues/search?search_term=park')
+    assert set(engines_used) <= {'replica 0', 'replica 1'} and engines_used
+
+
+def test_reads_outside_requests_use_the_primary(engines_used):
+    Venue.query.all()
+    assert set(engines_used) == {'primary'}
+
+
+def test_without_replicas_everything_uses_the_primary(app, client, monkeypatch):
+    monkeypatch.setitem(app.extensions, 'replicas', ReplicaPool([], {}))
+    used, listeners = _track({'primary': db.engine})
+    try:
+        assert _request(client, 'GET', '/venues/search?search_term=hop').status_code == 200
+        assert _request(client, 'POST', '/venues/create', data=VENUE_FORM).status_code == 302
+        with client.session_transaction() as session:
+            assert '_primary_until' not in session
+    finally:
+        for engine, record in listeners:
+            event.remove(engine, 'before_cursor_execute', record)
+    assert used
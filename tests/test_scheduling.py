@@ -0,0 +1,175 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.exc import IntegrityError
+from importer import import_rows
+from models import db, Show
+from scheduling import free_slots, overlap_message
+from conftest import add_artist, add_venue, require_extension
+
+Row = namedtuple('Row', 'start_time end_time')
+
+DAY = datetime(2030, 5, 1)
+
+
+def _at(hour, minute=0):
+    return DAY + timedelta(hours=hour, minutes=minute)
+
+
+def _add_show(venue, artist, start, end):
+    show = Show(venue_id=venue.id, artist_id=artist.id, start_time=start, end_time=end)
+    db.session.add(show)
+    db.session.flush()
+    return show
+
+#----------------------------------------------------------------------------#
+# free_slots().
+#----------------------------------------------------------------------------#
+
+
+def test_free_slots_of_an_empty_range():
+    # a venue without shows comes back as one row with no times
+    assert free_slots([Row(None, None)], _at(0), _at(24)) == [(_at(0), _at(24))]
+    assert free_slots([], _at(0), _at(24)) == [(_at(0), _at(24))]
+    assert free_slots([], _at(12), _at(12)) == []
+
+
+def test_free_slots_around_shows_straddling_the_range():
+    shows = [Row(_at(-2), _at(1)), Row(_at(10), _at(12)), Row(_at(23), _at(25))]
+    assert free_slots(shows, _at(0), _at(24)) == [(_at(1), _at(10)), (_at(12), _at(23))]
+
+
+def test_free_slots_between_back_to_back_shows():
+    shows = [Row(_at(18), _at(20)), Row(_at(20), _at(22)), Row(_at(21), _at(21, 30))]
+    assert free_slots(shows, _at(12), _at(24)) == [(_at(12), _at(18)), (_at(22), _at(24))]
+
+
+def test_free_slots_shorter_than_min_length_are_dropped():
+    shows = [Row(_at(18), _at(20)), Row(_at(21), _at(23))]
+    assert free_slots(shows, _at(0), _at(24), timedelta(minutes=90)) == [(_at(0), _at(18))]
+    assert free_slots(shows, _at(0), _at(24), timedelta(minutes=60)) == [
+        (_at(0), _at(18)), (_at(20), _at(21)), (_at(23), _at(24))]
+
+#----------------------------------------------------------------------------#
+# /venues/<id>/availability.
+#----------------------------------------------------------------------------#
+
+
+def test_availability_lists_the_free_time(client):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    _add_show(venue, artist, _at(18), _at(20))
+    _add_show(venue, artist, _at(21), _at(23))
+    _add_show(venue, artist, _at(-1), _at(-1) + timedelta(minutes=30))  # the day before
+    db.session.commit()
+
+    response = client.get(f'/venues/{venue.id}/availability?start=2030-05-01')
+    assert response.status_code == 200
+    assert response.json['free'] == [
+        {'start': '2030-05-01T00:00:00', 'end': '2030-05-01T18:00:00'},
+        {'start': '2030-05-01T20:00:00', 'end': '2030-05-01T21:00:00'},
+        {'start': '2030-05-01T23:00:00', 'end': '2030-05-02T00:00:00'}]
+
+    response = client.get(f'/venues/{venue.id}/availability?start=2030-05-01&minutes=90')
+    assert [slot['end'] for slot in response.json['free']] == ['2030-05-01T18:00:00']
+
+
+def test_availability_of_a_venue_without_shows(client):
+    venue = add_venue('The Musical Hop')
+    db.session.commit()
+    response = client.get(f'/venues/{venue.id}/availability?start=2030-05-01&end=2030-05-02')
+    assert response.json['free'] == [{'start': '2030-05-01T00:00:00', 'end': '2030-05-03T00:00:00'}]
+
+
+@pytest.mark.parametrize('query, status', [
+    ('', 400),
+    ('?start=May 1', 400),
+    ('?start=2030-05-02&end=2030-05-01', 400),
+    ('?start=2030-05-01&end=2031-05-01', 400)])
+def test_availability_rejects_bad_ranges(client, query, status):
+    venue = add_venue('The Musical Hop')
+    db.session.commit()
+    assert client.get(f'/venues/{venue.id}/availability{query}').status_code == status
+
+
+def test_availability_of_an_unknown_venue(client):
+    assert client.get('/venues/99/availability?start=2030-05-01').status_code == 404
+
+#----------------------------------------------------------------------------#
+# Constraints.
+#----------------------------------------------------------------------------#
+
+
+def test_show_must_end_after_it_starts(app):
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    with pytest.raises(IntegrityError) as error:
+        _add_show(venue, artist, _at(20), _at(20))
+    assert error.value.orig.diag.constraint_name == 'ck_shows_end_after_start'
+    assert overlap_message(error.value) is None
+    db.session.rollback()
+
+
+def test_overlapping_shows_are_rejected(app):
+    require_extension('btree_gist')
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    other_artist = add_artist('Matt Quevedo')
+    _add_show(venue, artist, _at(18), _at(20))
+    _add_show(venue, other_artist, _at(20), _at(22))  # back to back is fine
+
+    with pytest.raises(IntegrityError) as error:
+        _add_show(venue, other_artist, _at(19), _at(21))
+    assert overlap_message(error.value) == 'The venue already has a show at that time.'
+    db.session.rollback()
+
+
+def test_show_form_reports_an_overlap(client):
+    require_extension('btree_gist')
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    _add_show(venue, artist, _at(18), _at(20))
+    db.session.commit()
+
+    response = client.post('/shows/create', data={
+        'venue_id': venue.id, 'artist_id': add_artist('Matt Quevedo').id,
+        'start_time': '2030-05-01 19:00'}, follow_redirects=True)
+    assert b'The venue already has a show at that time.' in response.data
+    assert Show.query.count() == 1
+
+
+def test_api_answers_409_for_an_overlap(client):
+    require_extension('btree_gist')
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    _add_show(add_venue('Park Square Live'), artist, _at(18), _at(20))
+    db.session.commit()
+
+    response = client.post('/api/v1/shows', json={
+        'artist_id': artist.id, 'shows': [
+            {'venue_id': venue.id, 'start_time': '2030-04-30T19:00:00'},
+            {'venue_id': venue.id, 'start_time': '2030-05-01T19:00:00'}]})
+    assert response.status_code == 409
+    assert response.json == {'error': 'The artist already has a show at that time.'}
+    assert Show.query.count() == 1  # the whole batch is rolled back
+
+
+def test_import_skips_and_reports_overlapping_shows(app):
+    require_extension('btree_gist')
+    venue = add_venue('The Musical Hop')
+    artist = add_artist('Guns N Petals')
+    other_artist = add_artist('Matt Quevedo')
+    _add_show(venue, artist, _at(18), _at(20))
+    db.session.commit()
+
+    rows = [
+        (2, {'venue_id': venue.id, 'artist_id': other_artist.id, 'start_time': '2030-05-01 19:00'}),
+        (3, {'venue_id': venue.id, 'artist_id': other_artist.id, 'start_time': '2030-05-01 20:00'}),
+        # overlaps line 3, from the same chunk
+        (4, {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2030-05-01 21:00'}),
+    ]
+    errors = []
+    assert import_rows('shows', rows, on_error=lambda *error: errors.append(error)) == (1, 2)
+    assert errors == [(2, 'overlaps another show of the venue or artist'),
+                      (4, 'overlaps another show of the venue or artist')]
+    assert Show.query.count() == 2
@@ -0,0 +1,67 @@
+from models import db, Artist, Venue
+from search import search
+from conftest import add_artist, add_venue, query_count, require_extension
+
+
+def _names(results):
+    return [row['name'] for row in results['data']]
+
+
+def test_like_wildcards_in_the_term_match_literally(app):
+    add_venue('Half % Off Club')
+    add_venue('Half Price Club')
+    add_venue('The_Underscore')
+    add_venue('The Underscore')
+    db.session.commit()
+
+    assert _names(search(Venue, '%')) == ['Half % Off Club']
+    assert _names(search(Venue, 'the_')) == ['The_Underscore']
+
+
+def test_matches_name_city_or_genre(app):
+    add_artist('Matt Quevedo', genres=['Jazz'])
+    add_artist('The Wild Sax Band', genres=['Folk', 'Jazz'])
+    add_artist('Folkestone Five', genres=['Rock n Roll'])
+    add_artist('Guns N Petals', genres=['Rock n Roll'])
+    db.session.commit()
+
+    # name matches rank before genre-only ones
+    assert _names(search(Artist, 'folk')) == ['Folkestone Five', 'The Wild Sax Band']
+    assert _names(search(Artist, 'JAZZ')) == ['Matt Quevedo', 'The Wild Sax Band']
+    assert _names(search(Artist, 'San Fran')) == [
+        'Folkestone Five', 'Guns N Petals', 'Matt Quevedo', 'The Wild Sax Band']
+
+
+def test_pages_and_count(app):
+    for i in range(5):
+        add_venue(f'Hall {i}')
+    add_venue('Elsewhere', city='Austin', state='TX')
+    db.session.commit()
+
+    results = search(Venue, 'hall', page=2, per_page=2)
+    assert _names(results) == ['Hall 2', 'Hall 3']
+    assert (results['count'], results['page'], results['pages']) == (5, 2, 3)
+    assert search(Venue, 'hall', page=4, per_page=2)['data'] == []
+    assert search(Venue, 'nothing here')['pages'] == 1
+
+
+def test_search_page(client):
+    add_venue('The Musical Hop')
+    add_venue('Park Square Live Music & Coffee')
+    db.session.commit()
+
+    response = client.get('/venues/search?search_term=music')
+    assert response.status_code == 200
+    assert b'The Musical Hop' in response.data
+    assert b'Park Square Live Music &amp; Coffee' in response.data
+    assert query_count(response) == 2
+
+
+def test_ranks_by_similarity_with_pg_trgm(app, client):
+    require_extension('pg_trgm')
+    add_venue('A Hopeful Hall')
+    add_venue('Hop')
+    db.session.commit()
+    client.get('/')  # runs the startup check
+
+    assert _names(search(Venue, 'hop')) == ['Hop', 'A Hopeful Hall']
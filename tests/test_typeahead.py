@@ -0,0 +1,38 @@
+from models import db, Venue
+from app import refresh_typeahead_index, typeahead_index
+from conftest import add_artist, add_venue
+
+
+def _names(prefix):
+    return [result['name'] for result in typeahead_index.lookup(prefix)]
+
+
+def test_reload_picks_up_changes_made_by_other_workers(app):
+    hop = add_venue('The Musical Hop')
+    add_venue('Park Square Live Music & Coffee')
+    db.session.commit()
+    refresh_typeahead_index()
+    assert _names('musical') == ['The Musical Hop']
+
+    # written straight to the database, as another worker would
+    hop.name = 'The Dueling Pianos Bar'
+    Venue.query.filter_by(name='Park Square Live Music & Coffee').delete()
+    add_artist('Guns N Petals')
+    db.session.commit()
+
+    refresh_typeahead_index()
+    assert _names('musical') == []
+    assert _names('park') == []
+    assert _names('dueling') == ['The Dueling Pianos Bar']
+    assert _names('petals') == ['Guns N Petals']
+
+
+def test_unchanged_data_is_not_reloaded(app, monkeypatch):
+    add_venue('The Musical Hop')
+    db.session.commit()
+    refresh_typeahead_index()
+
+    loads = []
+    monkeypatch.setattr(typeahead_index, 'load', lambda *args: loads.append(args))
+    refresh_typeahead_index()
+    assert loads == []
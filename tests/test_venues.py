@@ -0,0 +1,28 @@
+from models import db
+from conftest import add_artist, add_show, add_venue, query_count
+
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Denver', 'CO'), ('Boston', 'MA'), ('Miami', 'FL')]
+
+
+def _seed_regions(regions):
+    artist = add_artist('Guns N Petals')
+    for i, (city, state) in enumerate(CITIES[:regions]):
+        for j in range(3):
+            venue = add_venue(f'Venue {i}-{j}', city=city, state=state)
+            add_show(venue, artist, days=i * 3 + j + 1)
+    db.session.commit()
+
+
+def test_venues_query_count_does_not_grow_with_regions(app, client):
+    _seed_regions(1)
+    one_region = client.get('/venues')
+    assert one_region.status_code == 200
+
+    _seed_regions(len(CITIES))
+    app.extensions['page_cache'].clear()
+    many_regions = client.get('/venues')
+    assert many_regions.status_code == 200
+    assert b'Seattle' in many_regions.data
+
+    assert query_count(many_regions) == query_count(one_region)
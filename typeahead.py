@@ -0,0 +1,109 @@
+import threading
+from bisect import bisect_left, insort
+
+#----------------------------------------------------------------------------#
+# Typeahead index.
+#----------------------------------------------------------------------------#
+
+# In-process prefix index of venue and artist names for autocomplete. Each
+# name is stored under every word-suffix ("the musical hop", "musical hop",
+# "hop") in one sorted list keyed by kind first, so a lookup is a binary
+# search followed by a short forward scan. Memory is bounded by max_entries
+# names, at most max_words keys per name and keys of at most
+# max_key_length characters.
+# Each worker process holds its own copy, loaded on its first request and
+# kept current by the create/edit/delete handlers. Changes made through
+# other workers are picked up by a periodic reload whenever the version of
+# the data (see app.py) differs from the one loaded.
+
+
+class PrefixIndex(object):
+
+    def __init__(self, max_entries=200000, max_words=8, max_key_length=64):
+        self.max_entries = max_entries
+        self.max_words = max_words
+        self.max_key_length = max_key_length
+        self.loaded = False
+        self.version = None  # identifies the data of the last load()
+        self._keys = []   # sorted (kind, key, id) tuples
+        self._names = {}  # (kind, id) -> display name
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def normalize(text):
+        return ' '.join(text.lower().split())
+
+    def _keys_for(self, name):
+        words = self.normalize(name).split(' ')[:self.max_words]
+        return {' '.join(words[i:])[:self.max_key_length] for i in range(len(words))}
+
+    def load(self, entries, version=None):
+        # entries: iterable of (kind, id, name); replaces the whole index
+        keys = []
+        names = {}
+        for kind, entry_id, name in entries:
+            if len(names) >= self.max_entries:
+                break
+            if not name:
+                continue
+            names[(kind, entry_id)] = name
+            keys.extend((kind, key, entry_id) for key in self._keys_for(name))
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._names = names
+            self.loaded = True
+            self.version = version
+
+    def add(self, kind, entry_id, name):
+        # adds or renames an entry; returns False once the index is full
+        with self._lock:
+            self._remove(kind, entry_id)
+            if not name or len(self._names) >= self.max_entries:
+                return False
+            self._names[(kind, entry_id)] = name
+            for key in self._keys_for(name):
+                insort(self._keys, (kind, key, entry_id))
+            return True
+
+    def remove(self, kind, entry_id):
+        with self._lock:
+            self._remove(kind, entry_id)
+
+    def _remove(self, kind, entry_id):
+        name = self._names.pop((kind, entry_id), None)
+        if name is None:
+            return
+        for key in self._keys_for(name):
+            i = bisect_left(self._keys, (kind, key, entry_id))
+            if i < len(self._keys) and self._keys[i] == (kind, key, entry_id):
+                del self._keys[i]
+
+    def lookup(self, prefix, kinds=('venue', 'artist'), limit=10):
+        prefix = self.normalize(prefix)[:self.max_key_length]
+        if not prefix:
+            return []
+
+        results = []
+        with self._lock:
+            for kind in kinds:
+                seen = set()
+                i = bisect_left(self._keys, (kind, prefix))
+                while i < len(self._keys) and len(seen) < limit:
+                    entry_kind, key, entry_id = self._keys[i]
+                    if entry_kind != kind or not key.startswith(prefix):
+                        break
+                    i += 1
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    results.append({
+                        'type': kind,
+                        'id': entry_id,
+                        'name': self._names[(kind, entry_id)]
+                    })
+        return results[:limit]